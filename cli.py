@@ -0,0 +1,108 @@
+# 课表命令行查询（不依赖 PyQt）
+#
+#     python cli.py today [--json]        今天的课程
+#     python cli.py next [--json]         下一节课
+#     python cli.py week [--week N]       本周（或第 N 周）的课程
+#     python cli.py day --week N --day D  第 N 周星期 D（0-6）的课程
+#
+# --tenant ID 查询多课表中某个班级的课表（data/tenants/<班级ID>/）。
+# 只导入课表核心模块，以只读方式读取课程快照或 courses.json，不写入任何数据文件。
+# 默认只在标准错误输出警告和错误，--verbose 时输出完整日志；
+# --timings 在标准错误输出导入、加载和查询的耗时。
+import sys
+import time
+import argparse
+
+from loguru import logger
+
+WEEKDAYS = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+
+
+def _format_course(course, slot_table):
+    """单门课程的文本表示"""
+    slot = course.get('slot', 0)
+    duration = course.get('duration', 1) or 1
+    last = min(slot + duration, len(slot_table)) - 1
+    if 0 <= slot < len(slot_table):
+        start = slot_table.start_of(slot)
+        end = slot_table.end_of(max(last, slot))
+        period = f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}"
+    else:
+        period = '--:--'
+    place = ' '.join(part for part in (course.get('location'), course.get('teacher')) if part)
+    return f"{WEEKDAYS[course.get('day', 0) % 7]} 第{slot + 1}节 {period} {course.get('name', '')} {place}".rstrip()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="课表命令行查询")
+    parser.add_argument('command', choices=['today', 'next', 'week', 'day'], help="查询内容")
+    parser.add_argument('--week', type=int, help="周次（默认为本周）")
+    parser.add_argument('--day', type=int, choices=range(7), metavar='0-6', help="星期（0 为周一，默认为今天）")
+    parser.add_argument('--tenant', help="班级ID（多课表时查询该班级的课表）")
+    parser.add_argument('--json', action='store_true', help="以 JSON 输出")
+    parser.add_argument('--timings', action='store_true', help="输出导入、加载和查询耗时")
+    parser.add_argument('--verbose', action='store_true', help="输出完整日志")
+    return parser
+
+
+def main(argv=None):
+    start = time.perf_counter()
+    args = build_parser().parse_args(argv)
+
+    if not args.verbose:
+        logger.remove()
+        logger.add(sys.stderr, level='WARNING')
+
+    import json
+    import datetime
+    from config import Config
+    from timetable import create_timetable
+    imported = time.perf_counter()
+
+    config = Config(read_only=True)
+    if args.tenant:
+        from registry import TimetableRegistry
+        registry = TimetableRegistry(config)
+        try:
+            timetable = registry.get(args.tenant)
+        except (KeyError, ValueError):
+            print(f"班级不存在: {args.tenant}", file=sys.stderr)
+            return 1
+    else:
+        timetable = create_timetable(config, read_only=True)
+    loaded = time.perf_counter()
+
+    week = args.week if args.week is not None else timetable.get_current_week()
+    day = args.day if args.day is not None else datetime.datetime.now().weekday()
+    if args.command == 'today':
+        result = {'week': timetable.get_current_week(), 'day': datetime.datetime.now().weekday(),
+                  'courses': timetable.get_today_courses()}
+    elif args.command == 'next':
+        result = {'course': timetable.get_next_course()}
+    elif args.command == 'week':
+        result = {'week': week, 'courses': timetable.get_weekly_courses(week)}
+    else:
+        result = {'week': week, 'day': day, 'courses': timetable.get_day_courses(week, day)}
+    queried = time.perf_counter()
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False))
+    else:
+        courses = result['courses'] if 'courses' in result else [c for c in [result['course']] if c]
+        slot_table = timetable.get_slot_table()
+        if not courses:
+            print("没有课程")
+        for course in courses:
+            print(_format_course(course, slot_table))
+
+    if args.timings:
+        print(
+            f"导入 {(imported - start) * 1000:.1f}ms  加载 {(loaded - imported) * 1000:.1f}ms  "
+            f"查询 {(queried - loaded) * 1000:.1f}ms  合计 {(time.perf_counter() - start) * 1000:.1f}ms",
+            file=sys.stderr
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
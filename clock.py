@@ -0,0 +1,108 @@
+import time
+import datetime
+from PyQt5.QtCore import QObject, QTimer, Qt
+from loguru import logger
+
+from scheduler import TimerWheel
+
+
+class ClockService(QObject):
+    """时钟服务，统一调度所有定时任务
+
+    所有任务保存在时间轮中，只使用一个单次 QTimer 指向最早的截止时间，
+    同一刻度内的任务合并为一次唤醒，其余时间进程保持休眠。
+    """
+    def __init__(self, parent=None, resolution=0.25):
+        super().__init__(parent)
+        self.wheel = TimerWheel(resolution)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._on_timeout)
+
+        logger.info("时钟服务初始化完成")
+
+    def call_at(self, deadline, callback, name=None):
+        """在指定时间（时间戳或 datetime）执行一次"""
+        if isinstance(deadline, datetime.datetime):
+            deadline = deadline.timestamp()
+        handle = self.wheel.schedule(deadline, callback, name=name)
+        self._arm()
+        return handle
+
+    def call_later(self, delay, callback, name=None):
+        """在 delay 秒后执行一次"""
+        return self.call_at(time.time() + delay, callback, name=name)
+
+    def call_every(self, interval, callback, align=False, name=None):
+        """每隔 interval 秒执行一次
+
+        align 为 True 时截止时间对齐到 interval 的整数倍（例如整秒、整分）。
+        """
+        now = time.time()
+        if align:
+            deadline = (now // interval + 1) * interval
+        else:
+            deadline = now + interval
+        handle = self.wheel.schedule(deadline, callback, interval=interval, name=name)
+        self._arm()
+        return handle
+
+    def call_daily(self, callback, at=datetime.time(0, 0), name=None):
+        """每天在本地时间 at 执行（按日期计算，不受夏令时影响）"""
+        def run():
+            if proxy.cancelled:
+                return
+            try:
+                callback()
+            finally:
+                schedule_next()
+
+        def schedule_next():
+            # 回调中取消了任务时不再安排下一次
+            if proxy.cancelled:
+                return
+            now = datetime.datetime.now()
+            deadline = datetime.datetime.combine(now.date(), at)
+            if deadline <= now:
+                deadline = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), at)
+            proxy.current = self.call_at(deadline, run, name=name or getattr(callback, '__name__', None))
+
+        proxy = _DailyHandle()
+        schedule_next()
+        return proxy
+
+    def cancel(self, handle):
+        """取消任务"""
+        if handle is not None:
+            handle.cancel()
+            self._arm()
+
+    def _arm(self):
+        """将 QTimer 设置为最早的截止时间"""
+        deadline = self.wheel.next_deadline()
+        if deadline is None:
+            self._timer.stop()
+            return
+
+        delay_ms = max(0, int((deadline - time.time()) * 1000))
+        # 长时间休眠后重新检查一次，防止系统时间调整后错过任务
+        self._timer.start(min(delay_ms, 3600 * 1000))
+
+    def _on_timeout(self):
+        """执行到期任务并等待下一个截止时间"""
+        self.wheel.advance(time.time())
+        self._arm()
+
+
+class _DailyHandle:
+    """每日任务句柄，取消时同时取消当前排定的那一次"""
+    def __init__(self):
+        self.current = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        if self.current is not None:
+            self.current.cancel()
@@ -0,0 +1,60 @@
+import zlib
+
+
+# 未匹配到学科的课程使用的调色板（Material Design 500 色）
+DEFAULT_PALETTE = [
+    '#3f51b5',  # 靛蓝
+    '#f44336',  # 红色
+    '#4caf50',  # 绿色
+    '#ff9800',  # 橙色
+    '#9c27b0',  # 紫色
+    '#009688',  # 青色
+    '#795548',  # 棕色
+    '#607d8b',  # 蓝灰色
+    '#e91e63',  # 粉色
+    '#673ab7',  # 深紫色
+    '#03a9f4',  # 浅蓝色
+    '#8bc34a',  # 浅绿色
+    '#ff5722',  # 深橙色
+    '#00bcd4',  # 青蓝色
+    '#2196f3',  # 蓝色
+]
+
+
+class ColorResolver:
+    """课程颜色解析器，按课程名称缓存解析结果"""
+    def __init__(self, color_map, palette=None):
+        # 学科关键字 -> 颜色，按插入顺序匹配
+        self.color_map = color_map
+        self.palette = palette or DEFAULT_PALETTE
+        self._cache = {}
+
+    def resolve(self, course_name):
+        """获取课程颜色，每个课程名称只计算一次"""
+        color = self._cache.get(course_name)
+        if color is None:
+            color = self._match(course_name)
+            self._cache[course_name] = color
+        return color
+
+    def cached(self):
+        """已解析的颜色（课程名称 -> 颜色）"""
+        return dict(self._cache)
+
+    def restore(self, cache):
+        """恢复之前解析的颜色"""
+        self._cache = dict(cache)
+
+    def clear(self):
+        """清空缓存（颜色映射或调色板修改后调用）"""
+        self._cache = {}
+
+    def _match(self, course_name):
+        """根据课程名称中的学科关键字匹配颜色"""
+        for subject, color in self.color_map.items():
+            if subject in course_name:
+                return color
+
+        # 没有匹配的学科时，按名称哈希从调色板中取一个固定颜色
+        index = zlib.crc32(course_name.encode('utf-8')) % len(self.palette)
+        return self.palette[index]
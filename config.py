@@ -1,14 +1,69 @@
 import os
+import copy
 import json
+import keyword
 import datetime
+import contextlib
 from pathlib import Path
 from loguru import logger
 
+from persistence import get_persistence
+
+class ConfigSection:
+    """配置分区的只读快照，配置项以属性方式访问"""
+    __slots__ = ()
+    
+    def get(self, key, default=None):
+        """按名称获取配置项"""
+        return getattr(self, key, default)
+    
+    def as_dict(self):
+        """转换为字典"""
+        return {key: getattr(self, key) for key in self.__slots__}
+    
+    def __repr__(self):
+        return f"{type(self).__name__}({self.as_dict()})"
+
+
+# (分区名, 配置项) -> 快照类，配置项不变时复用同一个类
+_section_classes = {}
+
+
+def _make_section(name, values):
+    """根据分区字典生成带 __slots__ 的快照对象"""
+    keys = tuple(k for k in values if isinstance(k, str) and k.isidentifier() and not keyword.iskeyword(k))
+    cls = _section_classes.get((name, keys))
+    if cls is None:
+        cls = type(f"{name.title().replace('_', '')}Section", (ConfigSection,), {'__slots__': keys})
+        _section_classes[(name, keys)] = cls
+    
+    section = cls()
+    for key in keys:
+        setattr(section, key, values[key])
+    return section
+
+
+_MISSING = object()
+
+
+def _keys_related(pattern, key):
+    """两个点分隔的键是否相同或存在上下级关系"""
+    return key == pattern or key.startswith(pattern + '.') or pattern.startswith(key + '.')
+
+
 class Config:
-    """配置管理类"""
-    def __init__(self):
+    """配置管理类
+    
+    read_only 为 True 时不写入配置文件（命令行查询、查询服务等只读入口使用）。
+    config_dir 为配置目录（默认为程序目录下的 data）；指定 base 时以 base 的配置为默认值，
+    配置文件只保存与 base 不同的配置项（多课表时每个班级的配置叠加在全局配置之上）。
+    """
+    def __init__(self, read_only=False, config_dir=None, base=None):
+        self.read_only = read_only
+        self.base = base
+        
         # 确保配置目录存在
-        self.config_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+        self.config_dir = config_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
         os.makedirs(self.config_dir, exist_ok=True)
         
         # 配置文件路径
@@ -26,6 +81,7 @@ class Config:
                 'semester_start_date': datetime.datetime.now().strftime('%Y-%m-%d'),
                 'current_week': 1,
                 'total_weeks': 20,
+                'storage': 'json',  # 课程存储后端: json 或 sqlite
                 'time_slots': [
                     {'name': '第1节', 'start': '08:00', 'end': '08:45'},
                     {'name': '第2节', 'start': '08:55', 'end': '09:40'},
@@ -57,12 +113,24 @@ class Config:
                 'custom_colors': {}
             }
         }
+        if base is not None:
+            self.default_config = copy.deepcopy(base.config)
+        
+        # 已解析的配置缓存，配置变化时清空
+        self._sections = {}
+        self._resolved = {}
+        
+        # 配置变化订阅者，以及批量修改期间累积的变化
+        self._listeners = []
+        self._batch_depth = 0
+        self._batch_changes = set()
         
         # 加载配置
         self.config = self.load_config()
     
     def load_config(self):
         """加载配置文件"""
+        self._invalidate()
         try:
             if os.path.exists(self.config_file):
                 with open(self.config_file, 'r', encoding='utf-8') as f:
@@ -70,30 +138,97 @@ class Config:
                 logger.info("配置文件加载成功")
                 
                 # 合并默认配置（确保新增配置项存在）
-                merged_config = self.default_config.copy()
+                merged_config = copy.deepcopy(self.default_config)
                 self._deep_update(merged_config, config)
                 return merged_config
             else:
                 logger.info("配置文件不存在，使用默认配置")
-                self.save_config(self.default_config)  # 保存默认配置
-                return self.default_config
+                if self.base is None:
+                    self.save_config(self.default_config)  # 保存默认配置
+                return copy.deepcopy(self.default_config)
         except Exception as e:
             logger.error(f"加载配置文件失败: {e}")
-            return self.default_config
+            return copy.deepcopy(self.default_config)
     
     def save_config(self, config=None):
         """保存配置文件"""
+        if self.read_only:
+            return False
         if config is None:
             config = self.config
+        if self.base is not None:
+            config = self._diff(self.default_config, config)
         
+        # 由写入服务在后台合并、原子写入
+        return get_persistence().save(self.config_file, config)
+    
+    def section(self, name):
+        """获取配置分区的快照，如 config.section('timetable').total_weeks
+        
+        快照在配置变化前一直复用，热路径上的读取只是一次属性访问。
+        """
+        view = self._sections.get(name)
+        if view is None:
+            values = self.config.get(name, {})
+            view = _make_section(name, values if isinstance(values, dict) else {})
+            self._sections[name] = view
+        return view
+    
+    def _invalidate(self, key=None):
+        """配置变化后清空已解析的缓存，指定 key 时只清空相关部分"""
+        if key is None:
+            self._sections = {}
+            self._resolved = {}
+            return
+        
+        self._sections.pop(key.split('.')[0], None)
+        for resolved_key in [k for k in self._resolved if _keys_related(key, k)]:
+            del self._resolved[resolved_key]
+    
+    def subscribe(self, keys, callback):
+        """订阅配置变化
+        
+        keys 为点分隔的键或分区名（或它们的列表），如 'timetable.time_slots'、'notification'。
+        相关配置变化时调用 callback(changed_keys)，changed_keys 为发生变化的键集合。
+        返回的句柄可用于取消订阅。
+        """
+        if isinstance(keys, str):
+            keys = [keys]
+        listener = (tuple(keys), callback)
+        self._listeners.append(listener)
+        return listener
+    
+    def unsubscribe(self, listener):
+        """取消订阅"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+    
+    @contextlib.contextmanager
+    def batch(self):
+        """批量修改配置，结束时每个订阅者只收到一次通知"""
+        self._batch_depth += 1
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=4)
-            logger.info("配置文件保存成功")
-            return True
-        except Exception as e:
-            logger.error(f"保存配置文件失败: {e}")
-            return False
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._batch_changes:
+                changes, self._batch_changes = self._batch_changes, set()
+                self._publish(changes)
+    
+    def _publish(self, changed_keys):
+        """通知订阅了相关配置的订阅者"""
+        if self._batch_depth:
+            self._batch_changes.update(changed_keys)
+            return
+        
+        for patterns, callback in list(self._listeners):
+            matched = {key for key in changed_keys if any(_keys_related(p, key) for p in patterns)}
+            if not matched:
+                continue
+            try:
+                callback(matched)
+            except Exception as e:
+                logger.error(f"处理配置变化失败: {', '.join(sorted(matched))}, {e}")
     
     def get(self, key, default=None, section=None):
         """获取配置项"""
@@ -101,12 +236,15 @@ class Config:
             if section:
                 return self.config.get(section, {}).get(key, default)
             
-            # 支持点分隔的键，如 'timetable.current_week'
+            # 支持点分隔的键，如 'timetable.current_week'，解析结果缓存到配置变化为止
             if '.' in key:
-                parts = key.split('.')
-                value = self.config
-                for part in parts:
-                    value = value.get(part, {})
+                value = self._resolved.get(key, _MISSING)
+                if value is _MISSING:
+                    parts = key.split('.')
+                    value = self.config
+                    for part in parts:
+                        value = value.get(part, {})
+                    self._resolved[key] = value
                 return value if value != {} else default
             
             return self.config.get(key, default)
@@ -116,6 +254,8 @@ class Config:
     
     def set(self, key, value, section=None):
         """设置配置项"""
+        full_key = f"{section}.{key}" if section else key
+        old_value = self.get(full_key, _MISSING)
         try:
             if section:
                 if section not in self.config:
@@ -133,12 +273,31 @@ class Config:
             else:
                 self.config[key] = value
             
+            # 值未变化时不保存也不通知（原地修改后再设置的同一个字典或列表仍视为变化）
+            modified_in_place = old_value is value and isinstance(value, (dict, list, set))
+            if old_value == value and not modified_in_place:
+                return True
+            
+            self._invalidate(full_key)
             self.save_config()
+            self._publish({full_key})
             return True
         except Exception as e:
             logger.error(f"设置配置项失败: {key}, {e}")
             return False
     
+    def _diff(self, base, config):
+        """与 base 不同的配置项（递归比较字典）"""
+        diff = {}
+        for k, v in config.items():
+            if isinstance(v, dict) and isinstance(base.get(k), dict):
+                sub = self._diff(base[k], v)
+                if sub:
+                    diff[k] = sub
+            elif k not in base or base[k] != v:
+                diff[k] = v
+        return diff
+    
     def _deep_update(self, d, u):
         """递归更新字典"""
         for k, v in u.items():
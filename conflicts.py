@@ -0,0 +1,131 @@
+from weeks import parse_weeks, has_week
+
+
+class ConflictIndex:
+    """课程冲突索引
+
+    按 (星期, 时间段) 记录占用该时间段的课程，持续多个课时的课程占用多个时间段。
+    两门课程在同一天、时间段有重叠且上课周有交集（周掩码按位与不为 0）时视为冲突。
+    添加课程时只检查它占用的时间段中已有的课程，整体耗时与课程数和冲突数成正比；
+    课程增删改时增量更新，无需重建。
+
+    group_by 为课程字段名（如 'location'、'teacher'）时只检查该字段相同的课程之间的冲突，
+    用于检查院系课表中的教室或教师冲突；字段为空的课程不参与检查。
+    """
+    def __init__(self, group_by=None):
+        self.group_by = group_by
+
+        # 课程ID -> (分组, 星期, 开始时间段, 结束时间段（不含）, 周掩码)
+        self._entries = {}
+        # (分组, 星期, 时间段) -> 占用该时间段的课程ID集合
+        self._cells = {}
+        # 课程ID -> {冲突课程ID: 冲突的周掩码}
+        self._conflicts = {}
+
+    @classmethod
+    def build(cls, courses, group_by=None):
+        """由课程列表建立索引"""
+        index = cls(group_by)
+        for course in courses:
+            index.add(course)
+        return index
+
+    def __len__(self):
+        """冲突的课程对数"""
+        return sum(len(others) for others in self._conflicts.values()) // 2
+
+    def __contains__(self, course_id):
+        return course_id in self._entries
+
+    def _entry(self, course):
+        """课程的占用范围，不参与检查时返回 None"""
+        group = None
+        if self.group_by is not None:
+            group = course.get(self.group_by)
+            if not group:
+                return None
+        start = course.get('slot', 0) or 0
+        duration = max(course.get('duration', 1) or 1, 1)
+        mask = parse_weeks(course.get('weeks'))
+        if not mask:
+            return None
+        return group, course.get('day'), start, start + duration, mask
+
+    def _find(self, entry, ignore_id=None):
+        """查找与占用范围冲突的课程，返回 {课程ID: 冲突的周掩码}"""
+        found = {}
+        if entry is None:
+            return found
+        group, day, start, end, mask = entry
+        for slot in range(start, end):
+            for other_id in self._cells.get((group, day, slot), ()):
+                if other_id == ignore_id or other_id in found:
+                    continue
+                common = mask & self._entries[other_id][4]
+                if common:
+                    found[other_id] = common
+        return found
+
+    def find(self, course, ignore_id=None):
+        """查找与课程冲突的已有课程（不修改索引），ignore_id 为正在编辑的课程自身"""
+        return self._find(self._entry(course), ignore_id)
+
+    def add(self, course):
+        """加入课程（已存在时更新），返回与它冲突的课程 {课程ID: 冲突的周掩码}"""
+        course_id = course.get('id')
+        if course_id in self._entries:
+            self.remove(course_id)
+
+        entry = self._entry(course)
+        if entry is None:
+            return {}
+        found = self._find(entry)
+        self._entries[course_id] = entry
+        group, day, start, end, _ = entry
+        for slot in range(start, end):
+            self._cells.setdefault((group, day, slot), set()).add(course_id)
+
+        self._conflicts[course_id] = dict(found)
+        for other_id, common in found.items():
+            self._conflicts[other_id][course_id] = common
+        return found
+
+    def remove(self, course_id):
+        """移除课程"""
+        entry = self._entries.pop(course_id, None)
+        if entry is None:
+            return False
+        group, day, start, end, _ = entry
+        for slot in range(start, end):
+            key = (group, day, slot)
+            cell = self._cells.get(key)
+            if cell is not None:
+                cell.discard(course_id)
+                if not cell:
+                    del self._cells[key]
+
+        for other_id in self._conflicts.pop(course_id, {}):
+            self._conflicts[other_id].pop(course_id, None)
+        return True
+
+    def conflicts_of(self, course_id):
+        """与指定课程冲突的课程 {课程ID: 冲突的周掩码}"""
+        return dict(self._conflicts.get(course_id, {}))
+
+    def pairs(self, week=None):
+        """所有冲突的课程对 [(课程ID, 课程ID, 冲突的周掩码)]，week 不为 None 时只返回该周的冲突"""
+        result = []
+        for course_id, others in self._conflicts.items():
+            for other_id, common in others.items():
+                if week is not None and not has_week(common, week):
+                    continue
+                # 每对只输出一次
+                if _sort_key(course_id) < _sort_key(other_id):
+                    result.append((course_id, other_id, common))
+        result.sort(key=lambda pair: (_sort_key(pair[0]), _sort_key(pair[1])))
+        return result
+
+
+def _sort_key(course_id):
+    """课程ID排序键（兼容非整数ID）"""
+    return (not isinstance(course_id, int), course_id if isinstance(course_id, int) else str(course_id))
@@ -0,0 +1,215 @@
+import csv
+import json
+
+from weeks import parse_weeks, weeks_to_list
+
+# 导入时识别的星期写法
+WEEKDAY_NAMES = {
+    '周一': 0, '周二': 1, '周三': 2, '周四': 3, '周五': 4, '周六': 5, '周日': 6,
+    '星期一': 0, '星期二': 1, '星期三': 2, '星期四': 3, '星期五': 4, '星期六': 5, '星期日': 6,
+    'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6,
+}
+
+# 读取 JSON 时每次读入的字符数
+CHUNK_SIZE = 64 * 1024
+
+# 单条 JSON 记录的最大字符数，超过时视为格式错误（避免把整个文件读入内存）
+MAX_RECORD_SIZE = 1024 * 1024
+
+
+class ImportResult:
+    """批量导入结果"""
+    def __init__(self):
+        self.imported = 0
+        self.errors = []  # [(行号, 错误信息)]
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def add_error(self, row, message):
+        self.errors.append((row, message))
+
+    def __repr__(self):
+        return f"ImportResult(imported={self.imported}, errors={len(self.errors)})"
+
+
+class _JsonStream:
+    """按块读取文件的 JSON 词法读取器，只缓存当前正在解析的值"""
+    def __init__(self, f):
+        self.f = f
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """读入下一块，丢弃已解析的部分"""
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+    def peek(self, separators=' \t\r\n'):
+        """跳过空白（和给定的分隔符），返回下一个字符，文件结束时返回空字符串"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in separators:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                return ''
+            self.fill()
+
+    def expect(self, char):
+        """跳过空白后读取指定字符，不符时抛出 ValueError"""
+        if self.peek() != char:
+            raise ValueError(f"JSON 格式错误: 应为 {char!r}")
+        self.pos += 1
+
+    def value(self, what):
+        """解析下一个完整的 JSON 值，what 用于错误信息"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # 值恰好在读取块末尾结束时可能是被截断的数字，读入更多后重新解析
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError as e:
+                # 值跨越了读取块时继续读取，文件已结束或值过大时为格式错误
+                if self.eof or len(self.buffer) - self.pos > MAX_RECORD_SIZE:
+                    raise ValueError(f"{what}格式错误: {e.msg}") from None
+            self.fill()
+
+
+def iter_json_courses(f):
+    """逐个读取 JSON 数组中的课程，不一次性读入整个文件
+
+    支持课程数组，以及 courses.json 格式的 {"courses": [...]}（其他键跳过）。
+    格式错误时抛出 ValueError。
+    """
+    stream = _JsonStream(f)
+
+    # 定位到课程数组的开头
+    first = stream.peek()
+    if first == '{':
+        stream.pos += 1
+        while True:
+            if stream.peek(' \t\r\n,') != '"':
+                raise ValueError("未找到课程数组")
+            key = stream.value("键名")
+            stream.expect(':')
+            if key == 'courses':
+                break
+            stream.value(f"{key}的值")
+    if stream.peek() != '[':
+        raise ValueError("未找到课程数组")
+    stream.pos += 1
+
+    row_no = 0
+    while True:
+        char = stream.peek(' \t\r\n,')
+        if not char:
+            raise ValueError("课程数组不完整")
+        if char == ']':
+            return
+        row_no += 1
+        yield stream.value(f"第{row_no}条课程记录")
+
+
+def iter_csv_courses(f):
+    """逐行读取 CSV 中的课程，第一行为列名"""
+    for row in csv.DictReader(f):
+        yield {key.strip(): value.strip() for key, value in row.items() if key is not None and value is not None}
+
+
+def parse_day(value):
+    """解析星期：0-6 的数字或 '周一'、'星期一'、'Mon' 等写法"""
+    if isinstance(value, str):
+        text = value.strip()
+        if text in WEEKDAY_NAMES:
+            return WEEKDAY_NAMES[text]
+        if text.lower()[:3] in WEEKDAY_NAMES:
+            return WEEKDAY_NAMES[text.lower()[:3]]
+        value = text
+    day = int(value)
+    if not 0 <= day <= 6:
+        raise ValueError(f"星期应为0-6: {value}")
+    return day
+
+
+def validate_course(row):
+    """校验并规范化一条课程记录，无效时抛出 ValueError"""
+    if not isinstance(row, dict):
+        raise ValueError("课程记录应为对象")
+
+    name = str(row.get('name') or '').strip()
+    if not name:
+        raise ValueError("缺少课程名称")
+
+    try:
+        day = parse_day(row.get('day'))
+    except (TypeError, ValueError):
+        raise ValueError(f"无效的星期: {row.get('day')!r}")
+
+    try:
+        slot = int(row.get('slot'))
+        duration = int(row.get('duration') or 1)
+    except (TypeError, ValueError):
+        raise ValueError(f"无效的节次: slot={row.get('slot')!r}, duration={row.get('duration')!r}")
+    if slot < 0 or duration < 1:
+        raise ValueError(f"无效的节次: slot={slot}, duration={duration}")
+
+    try:
+        mask = parse_weeks(row.get('weeks'))
+    except (TypeError, ValueError):
+        raise ValueError(f"无效的上课周: {row.get('weeks')!r}")
+    if not mask:
+        raise ValueError("缺少上课周")
+
+    course = {k: v for k, v in row.items() if k not in ('id', 'color') and v not in (None, '')}
+    course.update({
+        'name': name,
+        'teacher': str(row.get('teacher') or ''),
+        'location': str(row.get('location') or ''),
+        'day': day,
+        'slot': slot,
+        'duration': duration,
+        'weeks': weeks_to_list(mask),
+    })
+    return course
+
+
+def read_courses(source, format=None):
+    """逐条读取并校验课程，生成 (行号, 课程, 错误信息)
+
+    source 为文件路径或已打开的文本文件，format 为 'json' 或 'csv'，
+    未指定时按文件扩展名判断。课程有效时错误信息为 None，否则课程为 None。
+    """
+    if format is None:
+        name = source if isinstance(source, str) else getattr(source, 'name', '')
+        format = 'csv' if str(name).lower().endswith('.csv') else 'json'
+    if format not in ('json', 'csv'):
+        raise ValueError(f"不支持的导入格式: {format}")
+
+    if isinstance(source, str):
+        # utf-8-sig 兼容教务系统导出的带 BOM 的 CSV
+        f = open(source, 'r', encoding='utf-8-sig', newline='')
+    else:
+        f = source
+
+    try:
+        rows = iter_csv_courses(f) if format == 'csv' else iter_json_courses(f)
+        # CSV 第一行为列名，数据从第2行开始
+        first_row = 2 if format == 'csv' else 1
+        for row_no, row in enumerate(rows, first_row):
+            try:
+                yield row_no, validate_course(row), None
+            except (TypeError, ValueError) as e:
+                yield row_no, None, str(e)
+    finally:
+        if f is not source:
+            f.close()
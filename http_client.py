@@ -0,0 +1,146 @@
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+
+class HttpResponse:
+    """HTTP 响应，304 时携带上一次缓存的内容"""
+    def __init__(self, url, status_code, content, headers, not_modified=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.not_modified = not_modified  # 是否由 304 响应复用缓存内容
+
+    def raise_for_status(self):
+        """状态码表示错误时抛出异常"""
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+    def json(self):
+        """解析 JSON 内容"""
+        return json.loads(self.content)
+
+
+class _InflightRequest:
+    """正在进行的请求，相同 URL 的并发调用者共享结果"""
+    def __init__(self):
+        self.event = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class HttpClient:
+    """共享的 HTTP 客户端
+
+    使用连接池和长连接，支持 gzip 压缩、ETag / Last-Modified 条件请求，
+    并将同一 URL 的并发请求合并为一次网络访问。天气服务和插件共用此客户端。
+    """
+    def __init__(self, pool_size=4, max_cached=64):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+
+        # URL -> 上一次成功响应（用于条件请求）
+        self.max_cached = max_cached
+        self._cache = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.stats = {'requests': 0, 'not_modified': 0, 'coalesced': 0, 'bytes': 0}
+
+    def get(self, url, timeout=10):
+        """发送 GET 请求，相同 URL 的并发请求只访问一次网络"""
+        with self._lock:
+            inflight = self._inflight.get(url)
+            owner = inflight is None
+            if owner:
+                inflight = _InflightRequest()
+                self._inflight[url] = inflight
+            else:
+                self.stats['coalesced'] += 1
+
+        if not owner:
+            # 等待正在进行的请求完成
+            inflight.event.wait(timeout)
+            if inflight.error is not None:
+                raise inflight.error
+            if inflight.response is None:
+                raise requests.Timeout(f"等待请求超时: {url}")
+            return inflight.response
+
+        try:
+            inflight.response = self._fetch(url, timeout)
+            return inflight.response
+        except Exception as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[url]
+            inflight.event.set()
+
+    def _fetch(self, url, timeout):
+        """执行请求，有缓存时发送条件请求"""
+        headers = {}
+        with self._lock:
+            cached = self._cache.get(url)
+        if cached is not None:
+            if cached.headers.get('ETag'):
+                headers['If-None-Match'] = cached.headers['ETag']
+            if cached.headers.get('Last-Modified'):
+                headers['If-Modified-Since'] = cached.headers['Last-Modified']
+
+        response = self.session.get(url, headers=headers, timeout=timeout)
+        not_modified = response.status_code == 304 and cached is not None
+        with self._lock:
+            self.stats['requests'] += 1
+            if not_modified:
+                self.stats['not_modified'] += 1
+            else:
+                self.stats['bytes'] += self._received_bytes(response)
+
+        if not_modified:
+            logger.debug(f"内容未变化，使用缓存: {url}")
+            return HttpResponse(url, 200, cached.content, cached.headers, not_modified=True)
+
+        result = HttpResponse(url, response.status_code, response.content, response.headers)
+
+        # 只缓存带有校验信息的成功响应
+        if response.ok and ('ETag' in response.headers or 'Last-Modified' in response.headers):
+            with self._lock:
+                self._cache.pop(url, None)
+                self._cache[url] = result
+                while len(self._cache) > self.max_cached:
+                    self._cache.pop(next(iter(self._cache)))
+        return result
+
+    @staticmethod
+    def _received_bytes(response):
+        """响应体实际下载的字节数（gzip 压缩时为压缩后的大小）"""
+        try:
+            return response.raw.tell()
+        except Exception:
+            return len(response.content)
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """获取全局共享的 HTTP 客户端"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
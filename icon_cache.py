@@ -0,0 +1,70 @@
+import os
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPixmap
+from loguru import logger
+
+
+class IconCache:
+    """预缩放图标缓存
+
+    按 (图标名称, 设备像素比) 在内存中保存缩放好的 QPixmap，
+    同时在磁盘上保存缩放结果，下次启动时直接读取，不再重新缩放。
+    """
+    def __init__(self, icon_dir, cache_dir, size=32):
+        self.icon_dir = icon_dir
+        self.cache_dir = cache_dir
+        self.size = size
+        self._pixmaps = {}
+
+    def get(self, name, device_pixel_ratio=1.0):
+        """获取缩放好的图标，图标文件不存在时返回 None"""
+        key = (name, round(device_pixel_ratio, 2))
+        pixmap = self._pixmaps.get(key)
+        if pixmap is None:
+            pixmap = self._load(name, key[1])
+            if pixmap is None:
+                return None
+            self._pixmaps[key] = pixmap
+        return pixmap
+
+    def preload(self, names, device_pixel_ratio=1.0):
+        """预先加载一组图标"""
+        for name in set(names):
+            self.get(name, device_pixel_ratio)
+
+    def clear(self):
+        """清空内存缓存"""
+        self._pixmaps = {}
+
+    def _load(self, name, device_pixel_ratio):
+        """从磁盘缓存读取，缓存缺失或过期时从原图缩放并写入缓存"""
+        source_path = os.path.join(self.icon_dir, f"{name}.png")
+        if not os.path.exists(source_path):
+            return None
+
+        pixel_size = round(self.size * device_pixel_ratio)
+        cache_path = os.path.join(self.cache_dir, f"{name}_{self.size}@{device_pixel_ratio:g}x.png")
+
+        pixmap = None
+        try:
+            if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(source_path):
+                pixmap = QPixmap(cache_path)
+                if pixmap.isNull():
+                    pixmap = None
+        except OSError as e:
+            logger.warning(f"读取图标缓存失败: {e}")
+
+        if pixmap is None:
+            source = QPixmap(source_path)
+            if source.isNull():
+                logger.warning(f"无法读取图标: {source_path}")
+                return None
+            pixmap = source.scaled(pixel_size, pixel_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                pixmap.save(cache_path, 'PNG')
+            except Exception as e:
+                logger.warning(f"保存图标缓存失败: {e}")
+
+        pixmap.setDevicePixelRatio(device_pixel_ratio)
+        return pixmap
@@ -0,0 +1,247 @@
+import os
+import json
+import threading
+from loguru import logger
+
+from locks import FileLock
+
+
+class CourseJournal:
+    """课程修改日志
+
+    每次添加、更新、删除课程只向日志文件追加一行 JSON，不再重写整个 courses.json。
+    加载时在 courses.json 的基础上按顺序重放日志；日志达到一定长度后，
+    把日志段转为待合并日志段，由写入服务在后台按 courses.json 和该日志段生成新的 courses.json，
+    写入完成后删除已合并的日志段。
+
+    每条记录都是课程的完整内容（或删除），重复重放结果不变，
+    因此合并过程中任意时刻程序退出都不会丢失修改。
+
+    多个进程可能同时打开同一份课表（如界面和命令行）：追加、转换和删除日志段都在
+    排他文件锁 courses.journal.lock 中进行，每次追加都重新打开日志文件，
+    因此总是写入当前的日志文件。只有持有 courses.journal.owner 锁的进程（写入者）才会合并日志。
+    """
+    def __init__(self, path, compact_threshold=200):
+        self.path = path
+        # 正在合并（或上次合并未完成）的日志段
+        self.rotated_path = path + '.old'
+        self.compact_threshold = compact_threshold
+
+        self.lock = FileLock(path + '.lock')
+        self._owner_lock = FileLock(path + '.owner')
+        self.owner = False  # 是否为负责合并日志的写入者
+
+        self.entries = 0  # 当前日志段的记录数
+        self.next_id = 0  # 重放的记录中最大的下一个可用课程ID
+        self._compacting = False
+        # 本进程最后一次读写后的日志文件签名，不一致说明其他进程修改过日志
+        self._known = None
+        self.diverged = False
+        self._state_lock = threading.Lock()
+
+    def acquire_writer(self):
+        """尝试成为写入者（同一份课表同时只有一个写入者），返回是否成功"""
+        if not self.owner:
+            self.owner = self._owner_lock.acquire(blocking=False)
+        return self.owner
+
+    def release_writer(self):
+        """放弃写入者身份"""
+        if self.owner:
+            self._owner_lock.release()
+            self.owner = False
+
+    def _signature(self):
+        """日志文件的 (inode, 大小) 以及待合并日志段是否存在"""
+        try:
+            stat = os.stat(self.path)
+            current = (stat.st_ino, stat.st_size)
+        except FileNotFoundError:
+            current = None
+        return current, os.path.exists(self.rotated_path)
+
+    def _check_foreign(self):
+        """检查日志是否被其他进程修改过（需持有文件锁）"""
+        if self._known is not None and self._signature() != self._known:
+            self.diverged = True
+
+    def in_sync(self):
+        """内存中的课程是否与日志文件一致（其他进程没有修改过日志）"""
+        with self.lock:
+            return not self.diverged and self._signature() == self._known
+
+    def mark_synced(self):
+        """记录内存中的课程与当前日志文件一致，并统计日志段的记录数（从快照加载后调用）"""
+        with self.lock:
+            entries = 0
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    entries = sum(1 for line in f if line.strip())
+            with self._state_lock:
+                self.entries = entries
+            self._known = self._signature()
+            self.diverged = False
+
+    @staticmethod
+    def _encode(op, course=None, course_id=None, next_id=None):
+        record = {'op': op}
+        if course is not None:
+            record['course'] = course
+        if course_id is not None:
+            record['id'] = course_id
+        if next_id is not None:
+            record['next_id'] = next_id
+        return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+    def append(self, op, course=None, course_id=None, next_id=None):
+        """追加一条记录：op 为 'put'（添加或更新）或 'delete'，next_id 为当前的ID计数器"""
+        self._write([self._encode(op, course, course_id, next_id)])
+
+    def append_many(self, courses, next_id=None):
+        """一次写入多条 'put' 记录（批量导入时使用）"""
+        self._write([self._encode('put', course, next_id=next_id) for course in courses])
+
+    def _write(self, lines):
+        """在文件锁中追加记录并同步到磁盘"""
+        if not lines:
+            return
+        with self.lock:
+            self._check_foreign()
+            # 每次按路径重新打开，日志被其他进程转换后写入新的日志文件
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(''.join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            with self._state_lock:
+                self.entries += len(lines)
+            self._known = self._signature()
+
+    def replay(self, courses):
+        """在课程列表上重放日志（先重放上次未完成合并的日志段），返回重放的记录数"""
+        with self.lock:
+            count, rotated_next_id = self._replay_file(self.rotated_path, courses)
+            entries, next_id = self._replay_file(self.path, courses)
+            self.next_id = max(rotated_next_id, next_id)
+            with self._state_lock:
+                self.entries = entries
+            self._known = self._signature()
+        count += entries
+        if count:
+            logger.info(f"已重放{count}条课程修改记录")
+        return count
+
+    def replay_rotated(self, courses):
+        """只重放待合并日志段（生成合并后的 courses.json 时使用），返回段中最大的ID计数器"""
+        return self._replay_file(self.rotated_path, courses)[1]
+
+    def _replay_file(self, path, courses):
+        """在课程列表上重放一个日志文件，返回 (记录数, 最大的ID计数器)"""
+        if not os.path.exists(path):
+            return 0, 0
+        count = next_id = 0
+        positions = {course.get('id'): i for i, course in enumerate(courses)}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 写入中途退出时最后一行可能不完整
+                    logger.warning(f"忽略损坏的日志记录: {os.path.basename(path)}:{line_no}")
+                    continue
+                self._apply(courses, positions, record)
+                next_id = max(next_id, record.get('next_id', 0))
+                count += 1
+        return count, next_id
+
+    def _apply(self, courses, positions, record):
+        """应用一条记录"""
+        op = record.get('op')
+        if op == 'put':
+            course = record['course']
+            index = positions.get(course.get('id'))
+            if index is None:
+                positions[course.get('id')] = len(courses)
+                courses.append(course)
+            else:
+                courses[index] = course
+        elif op == 'delete':
+            index = positions.pop(record.get('id'), None)
+            if index is not None:
+                # 用最后一门课程填补空位，与 TimeTable 的删除方式一致
+                last = courses.pop()
+                if index < len(courses):
+                    courses[index] = last
+                    positions[last.get('id')] = index
+
+    @property
+    def compacting(self):
+        """是否有合并正在进行"""
+        return self._compacting
+
+    def has_pending(self):
+        """是否有尚未合并到 courses.json 的记录"""
+        return self.entries > 0 or os.path.exists(self.rotated_path)
+
+    def needs_compaction(self):
+        """日志是否已足够长，需要合并（只有写入者合并日志）"""
+        return self.owner and self.entries >= self.compact_threshold and not self._compacting
+
+    def rotate(self):
+        """开始合并：将当前日志段转为待合并日志段，之后的修改写入新日志
+
+        不是写入者或已有合并在进行时返回 False。
+        """
+        with self.lock:
+            if not self.owner or self._compacting:
+                return False
+            self._check_foreign()
+
+            if os.path.exists(self.path):
+                if os.path.exists(self.rotated_path):
+                    # 上次合并未完成，把当前日志接到待合并日志段之后
+                    with open(self.path, 'r', encoding='utf-8') as src, \
+                            open(self.rotated_path, 'a', encoding='utf-8') as dst:
+                        dst.write(src.read())
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(self.path)
+                else:
+                    os.replace(self.path, self.rotated_path)
+
+            with self._state_lock:
+                self.entries = 0
+                self._compacting = True
+            self._known = self._signature()
+            return True
+
+    def finish_compaction(self, ok):
+        """合并写入完成后调用：成功时删除已合并的日志段"""
+        with self.lock:
+            if ok:
+                try:
+                    os.remove(self.rotated_path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"删除已合并的日志失败: {e}")
+            with self._state_lock:
+                self._compacting = False
+            self._known = self._signature()
+
+    def clear(self):
+        """删除所有日志（课程数据已整体重写时使用）"""
+        with self.lock:
+            for path in (self.path, self.rotated_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            with self._state_lock:
+                self.entries = 0
+            self._known = self._signature()
+
+    def close(self):
+        """关闭日志（放弃写入者身份）"""
+        self.release_writer()
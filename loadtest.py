@@ -0,0 +1,92 @@
+import sys
+import time
+import asyncio
+import argparse
+from urllib.parse import urlsplit
+
+
+async def _worker(host, port, path, deadline, latencies, errors):
+    """单个客户端：在一个长连接上连续发送请求，记录每次请求的耗时"""
+    request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('latin-1')
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = 0
+            for line in head.split(b'\r\n'):
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+
+            if not head.startswith(b'HTTP/1.1 200'):
+                errors.append(head.split(b'\r\n', 1)[0].decode('latin-1'))
+        except (OSError, asyncio.IncompleteReadError) as e:
+            errors.append(str(e))
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+def _percentile(sorted_values, percent):
+    """已排序数据的百分位数"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[index]
+
+
+async def run_load_test(url, concurrency=50, duration=10.0):
+    """对 url 进行压力测试，返回统计结果（耗时单位为毫秒）"""
+    parts = urlsplit(url)
+    host = parts.hostname or '127.0.0.1'
+    port = parts.port or 80
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(
+        _worker(host, port, path, deadline, latencies, errors) for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'p50': _percentile(latencies, 50) * 1000,
+        'p99': _percentile(latencies, 99) * 1000,
+        'max': (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="课表查询服务压力测试")
+    parser.add_argument('url', nargs='?', default='http://127.0.0.1:8765/today', help="测试地址")
+    parser.add_argument('-c', '--concurrency', type=int, default=50, help="并发连接数")
+    parser.add_argument('-d', '--duration', type=float, default=10.0, help="测试时长（秒）")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run_load_test(args.url, args.concurrency, args.duration))
+    print(f"请求数: {result['requests']}  错误: {result['errors']}")
+    print(f"吞吐量: {result['rps']:.0f} 请求/秒")
+    print(f"延迟: p50 {result['p50']:.2f}ms  p99 {result['p99']:.2f}ms  最大 {result['max']:.2f}ms")
+    return 0 if result['errors'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
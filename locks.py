@@ -0,0 +1,84 @@
+import os
+import time
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """跨进程的排他文件锁（同一进程内可重入）
+
+    使用 fcntl.flock（Windows 上为 msvcrt.locking）锁定 path，
+    持有锁的进程退出时操作系统自动释放。
+    """
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._fd = None
+        self._depth = 0
+
+    def acquire(self, blocking=True):
+        """获取锁，blocking 为 False 且锁被其他进程持有时返回 False"""
+        if not self._thread_lock.acquire(blocking):
+            return False
+        if self._depth == 0:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                self._lock_fd(fd, blocking)
+            except OSError:
+                os.close(fd)
+                self._thread_lock.release()
+                return False
+            self._fd = fd
+        self._depth += 1
+        return True
+
+    def release(self):
+        """释放锁"""
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            try:
+                self._unlock_fd(fd)
+            finally:
+                os.close(fd)
+        self._thread_lock.release()
+
+    @property
+    def held(self):
+        """当前线程是否持有锁"""
+        return self._depth > 0
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    @staticmethod
+    def _lock_fd(fd, blocking):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            return
+        os.lseek(fd, 0, os.SEEK_SET)
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                if not blocking:
+                    raise
+                time.sleep(0.05)
+
+    @staticmethod
+    def _unlock_fd(fd):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
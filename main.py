@@ -6,17 +6,21 @@ import platform
 from pathlib import Path
 
 from PyQt5 import QtCore, QtGui, QtWidgets
-from PyQt5.QtCore import Qt, QTimer, QDateTime, QDate, QTime, QSize
-from PyQt5.QtGui import QIcon, QColor, QFont, QPixmap
+from PyQt5.QtCore import Qt, QDateTime, QDate, QTime, QSize, pyqtSignal
+from PyQt5.QtGui import QIcon, QColor, QFont
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QLabel, QPushButton, QSystemTrayIcon, QMenu, QAction
 from qt_material import apply_stylesheet
 from loguru import logger
 
 from config import Config
-from timetable import TimeTable
+from timetable import create_timetable
 from weather import WeatherService
 from notification import NotificationService
 from plugin import PluginManager
+from clock import ClockService
+from icon_cache import IconCache
+from persistence import get_persistence
+from timetable_widget import TimetableView
 
 # 设置高DPI缩放
 QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
@@ -24,6 +28,9 @@ QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
 
 class MainWindow(QMainWindow):
     """主窗口类"""
+    # 后台线程更新天气完成后通知主线程刷新界面
+    weather_updated = pyqtSignal(bool)
+    
     def __init__(self):
         super().__init__()
         
@@ -34,15 +41,30 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("LitheTimetable")
         self.setMinimumSize(800, 600)
         
+        # 初始化时钟服务（统一调度所有定时任务）
+        self.clock = ClockService(self)
+        self.reminder_handle = None
+        self.week_rollover_handle = None
+        self.weather_handle = None
+        
         # 初始化服务
         self.weather_service = WeatherService(self.config)
+        
+        # 天气图标缓存（内存和磁盘中保存缩放好的图标）
+        app_dir = os.path.dirname(os.path.abspath(__file__))
+        self.weather_icon_cache = IconCache(
+            os.path.join(app_dir, 'assets', 'weather'),
+            os.path.join(app_dir, 'data', 'icon_cache'),
+            size=32
+        )
         self.notification_service = NotificationService(self.config)
         
         # 加载课表
-        self.timetable = TimeTable(self.config)
+        self.timetable = create_timetable(self.config)
         
         # 初始化插件管理器
         self.plugin_manager = PluginManager(self.config)
+        self.plugin_manager.clock = self.clock
         self.plugin_manager.load_plugins()
         
         # 初始化UI
@@ -54,13 +76,19 @@ class MainWindow(QMainWindow):
         # 加载课表数据
         self.load_timetable()
         
-        # 更新天气
+        # 更新天气（先显示缓存，后台获取最新数据）
+        self.weather_updated.connect(self.on_weather_updated)
         self.update_weather()
         
-        # 初始化定时器
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_time)
-        self.timer.start(1000)  # 每秒更新一次
+        # 订阅配置变化，只在相关配置变化时刷新对应部分
+        self.config.subscribe(['timetable'], self.on_timetable_config_changed)
+        self.config.subscribe(['notification'], self.on_notification_config_changed)
+        self.config.subscribe(['weather'], self.on_weather_config_changed)
+        self.config.subscribe(['appearance.theme'], self.apply_theme)
+        
+        # 时钟在整秒刷新，日期变化时更新日期和课程提醒
+        self.clock.call_every(1, self.update_time, align=True)
+        self.clock.call_daily(self.on_day_changed)
         
         logger.info("应用程序启动完成")
     
@@ -127,6 +155,13 @@ class MainWindow(QMainWindow):
         self.timetable_title = QLabel("本周课表")
         self.timetable_title.setStyleSheet("font-size: 18px; font-weight: 500; color: #212121; margin-bottom: 8px;")
         
+        # 课表视图（单个自绘控件）
+        self.timetable_view = TimetableView()
+        self.timetable_view.course_clicked.connect(self.edit_course)
+        
+        self.timetable_layout.addWidget(self.timetable_title)
+        self.timetable_layout.addWidget(self.timetable_view, 1)
+        
         # 底部状态栏
         self.status_bar = QtWidgets.QHBoxLayout()
         self.status_bar.setContentsMargins(0, 0, 0, 0)
@@ -154,6 +189,7 @@ class MainWindow(QMainWindow):
         
         # 初始更新时间
         self.update_time()
+        self.update_date()
     
     def init_tray(self):
         """初始化系统托盘"""
@@ -193,140 +229,145 @@ class MainWindow(QMainWindow):
         
         # 更新时间标签
         self.time_label.setText(current_datetime.toString("HH:mm:ss"))
-        
-        # 更新日期标签
-        date_str = current_datetime.toString("yyyy年MM月dd日 dddd")
+    
+    def update_date(self):
+        """更新日期显示"""
+        date_str = QDateTime.currentDateTime().toString("yyyy年MM月dd日 dddd")
         self.date_label.setText(date_str)
-        
-        # 检查是否需要更新课表（例如，在午夜）
-        if current_datetime.time().hour() == 0 and current_datetime.time().minute() == 0 and current_datetime.time().second() == 0:
-            self.load_timetable()
-        
-        # 检查是否需要发送课程提醒
-        self.check_class_notifications()
+    
+    def on_day_changed(self):
+        """日期变化（午夜）时更新日期并重新规划今天的课程提醒"""
+        self.update_date()
+        self.schedule_reminders()
+        logger.info("日期已变化")
     
     def update_weather(self):
         """更新天气信息"""
-        weather_data = self.weather_service.get_weather()
+        # 立即显示缓存数据
+        self.show_weather(self.weather_service.get_cached_weather())
+        
+        # 取消已排定的刷新，保证始终只有一个刷新任务
+        self.clock.cancel(self.weather_handle)
+        self.weather_handle = None
+        if not self.config.get('weather.enable', True):
+            return
+        
+        # 过期时在后台线程重新获取，完成后再安排下一次刷新
+        if self.weather_service.is_stale() and self.weather_service.refresh_async(self.weather_updated.emit):
+            return
+        self.schedule_weather_refresh()
+    
+    def schedule_weather_refresh(self):
+        """按配置的更新间隔（失败时指数退避）安排下一次天气刷新"""
+        self.clock.cancel(self.weather_handle)
+        delay = self.weather_service.next_refresh_delay()
+        self.weather_handle = self.clock.call_later(delay, self.update_weather)
+        logger.info(f"下次天气刷新: {int(delay)}秒后")
+    
+    def on_weather_updated(self, success):
+        """后台天气更新完成"""
+        if success:
+            self.show_weather(self.weather_service.get_cached_weather())
+        self.schedule_weather_refresh()
+    
+    def show_weather(self, weather_data):
+        """显示天气信息"""
         if weather_data:
             self.weather_info.setText(f"{weather_data['temperature']}°C {weather_data['condition']}")
             
             # 设置天气图标
-            icon_path = os.path.join("assets", "weather", f"{weather_data['icon']}.png")
-            if os.path.exists(icon_path):
-                self.weather_icon.setPixmap(QPixmap(icon_path).scaled(32, 32, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-        
-        # 设置定时更新天气（每小时）
-        QTimer.singleShot(3600000, self.update_weather)
+            pixmap = self.weather_icon_cache.get(weather_data['icon'], self.devicePixelRatioF())
+            if pixmap is not None:
+                self.weather_icon.setPixmap(pixmap)
+        
+        # 多日预报直接来自缓存
+        forecast_lines = [
+            f"{day['date'][5:]} {day['condition']} {day['low']}~{day['high']}"
+            for day in self.weather_service.get_forecast()
+        ]
+        self.weather_widget.setToolTip("\n".join(forecast_lines))
     
     def load_timetable(self):
         """加载课表"""
-        # 清除现有课表
-        for i in reversed(range(self.timetable_layout.count())):
-            if i > 0:  # 保留标题
-                widget = self.timetable_layout.itemAt(i).widget()
-                if widget:
-                    widget.deleteLater()
-        
         # 获取当前周的课表
         current_week = self.timetable.get_current_week()
         self.timetable_title.setText(f"第{current_week}周课表")
         
-        # 创建课表网格
-        timetable_grid = QtWidgets.QGridLayout()
-        
-        # 添加表头
-        weekdays = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-        for i, day in enumerate(weekdays):
-            header = QLabel(day)
-            header.setAlignment(Qt.AlignCenter)
-            header.setStyleSheet("font-weight: bold; padding: 5px;")
-            timetable_grid.addWidget(header, 0, i+1)
-        
-        # 添加时间段
-        time_slots = self.timetable.get_time_slots()
-        for i, slot in enumerate(time_slots):
-            time_label = QLabel(f"{slot['start']}-{slot['end']}")
-            time_label.setAlignment(Qt.AlignCenter)
-            time_label.setStyleSheet("font-weight: bold; padding: 5px;")
-            timetable_grid.addWidget(time_label, i+1, 0)
-        
-        # 填充课程
-        courses = self.timetable.get_weekly_courses(current_week)
-        for course in courses:
-            day = course['day']  # 0-6 表示周一到周日
-            slot = course['slot']  # 从0开始的时间段索引
-            
-            course_widget = self.create_course_widget(course)
-            timetable_grid.addWidget(course_widget, slot+1, day+1)
-        
-        # 添加空白单元格
-        for row in range(1, len(time_slots)+1):
-            for col in range(1, 8):
-                if timetable_grid.itemAtPosition(row, col) is None:
-                    empty = QWidget()
-                    empty.setStyleSheet("background-color: rgba(0, 0, 0, 0.05); border-radius: 5px;")
-                    timetable_grid.addWidget(empty, row, col)
-        
-        # 将网格添加到课表布局
-        grid_widget = QWidget()
-        grid_widget.setLayout(timetable_grid)
-        self.timetable_layout.addWidget(grid_widget)
-        
-        logger.info(f"已加载第{current_week}周课表")
-    
-    def create_course_widget(self, course):
-        """创建课程卡片"""
-        widget = QWidget()
-        widget.mousePressEvent = lambda event: self.edit_course(course)
-        layout = QtWidgets.QVBoxLayout(widget)
-        layout.setContentsMargins(5, 5, 5, 5)
-        
-        # 设置背景颜色
-        color = course.get('color', '#3f51b5')  # 默认使用蓝色
-        widget.setStyleSheet(f"background-color: {color}; color: white; border-radius: 5px;")
-        
-        # 课程名称
-        name_label = QLabel(course['name'])
-        name_label.setAlignment(Qt.AlignCenter)
-        name_label.setWordWrap(True)
-        name_label.setStyleSheet("font-weight: bold; font-size: 12px;")
-        
-        # 教室
-        location_label = QLabel(course.get('location', ''))
-        location_label.setAlignment(Qt.AlignCenter)
-        location_label.setStyleSheet("font-size: 10px;")
+        # 课程未变化时不会重绘
+        self.timetable_view.set_time_slots(self.timetable.get_time_slots())
+        self.timetable_view.set_courses(self.timetable.get_weekly_courses(current_week))
         
-        # 教师
-        teacher_label = QLabel(course.get('teacher', ''))
-        teacher_label.setAlignment(Qt.AlignCenter)
-        teacher_label.setStyleSheet("font-size: 10px;")
+        # 标出本周时间冲突的课程
+        conflicts = self.timetable.get_conflicts(current_week)
+        self.timetable_view.set_conflicts(course['id'] for pair in conflicts for course in pair)
+        for first, second in conflicts:
+            logger.warning(f"第{current_week}周课程时间冲突: {first['name']} 与 {second['name']}")
         
-        layout.addWidget(name_label)
-        layout.addWidget(location_label)
-        layout.addWidget(teacher_label)
+        # 课程或设置可能已变化，重新规划课程提醒和教学周切换
+        self.schedule_reminders()
+        self.schedule_week_rollover()
         
-        return widget
+        logger.info(f"已加载第{current_week}周课表")
+    
+    def schedule_week_rollover(self):
+        """在下一个教学周开始时重新加载课表"""
+        self.clock.cancel(self.week_rollover_handle)
+        self.week_rollover_handle = None
+        
+        next_week_start = self.timetable.get_next_week_start()
+        if next_week_start is not None:
+            deadline = datetime.datetime.combine(next_week_start, datetime.time())
+            self.week_rollover_handle = self.clock.call_at(deadline, self.load_timetable)
+    
+    def schedule_reminders(self):
+        """重新规划课程提醒并设置定时器"""
+        self.notification_service.plan_reminders(self.timetable)
+        self.arm_reminder_timer()
+    
+    def arm_reminder_timer(self):
+        """将提醒任务设置为最早的提醒时间"""
+        self.clock.cancel(self.reminder_handle)
+        self.reminder_handle = None
+        
+        fire_at = self.notification_service.scheduler.next_fire_time()
+        if fire_at is not None:
+            self.reminder_handle = self.clock.call_at(fire_at, self.check_class_notifications)
     
     def check_class_notifications(self):
-        """检查是否需要发送课程提醒"""
-        self.notification_service.check_upcoming_classes(self.timetable)
+        """发送已到期的课程提醒"""
+        self.notification_service.fire_due_reminders()
+        self.arm_reminder_timer()
     
     def open_settings(self):
         """打开设置窗口"""
         from settings import SettingsDialog
         settings_dialog = SettingsDialog(self.config, self.timetable, self)
-        if settings_dialog.exec_():
-            # 如果用户点击了保存按钮，重新加载配置
-            self.load_timetable()
-            self.update_weather()
-            
-            # 应用新主题（如果有变化）
-            theme = self.config.get('appearance.theme', 'light_blue')
-            apply_stylesheet(QApplication.instance(), theme=f'{theme}.xml')
-            
+        # 设置窗口中的修改合并为一次变化通知，只刷新实际变化的部分
+        with self.config.batch():
+            settings_dialog.exec_()
+        
         logger.info("设置窗口已关闭")
     
+    def on_timetable_config_changed(self, changed_keys):
+        """课表配置（学期、时间段）变化时重新加载课表"""
+        self.load_timetable()
+    
+    def on_notification_config_changed(self, changed_keys):
+        """通知设置变化时重新规划课程提醒"""
+        self.schedule_reminders()
+    
+    def on_weather_config_changed(self, changed_keys):
+        """天气设置变化时重新安排天气刷新"""
+        if changed_keys & {'weather.city', 'weather.city_code', 'weather.enable'}:
+            # 城市变化后缓存失效，立即重新获取
+            self.weather_service.last_update_time = 0
+        self.update_weather()
+    
+    def apply_theme(self, changed_keys=None):
+        """应用主题"""
+        theme = self.config.get('appearance.theme', 'light_blue')
+        apply_stylesheet(QApplication.instance(), theme=f'{theme}.xml')
+    
     def open_plugin_settings(self):
         """打开插件设置窗口"""
         from plugin_settings import PluginSettingsDialog
@@ -339,12 +380,19 @@ class MainWindow(QMainWindow):
     def close_application(self):
         """关闭应用程序"""
         logger.info("应用程序关闭")
+        # 写入所有尚未保存的数据
+        get_persistence().flush()
+        # 课程文件写入完成后保存快照，下次启动直接读取
+        self.timetable.save_snapshot()
         QApplication.quit()
     
     def edit_course(self, course):
         """编辑课程"""
         from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QLineEdit, QPushButton, QColorDialog
         
+        # 在副本上编辑，保存时通过 update_course 写回
+        course = dict(course)
+        
         dialog = QDialog(self)
         dialog.setWindowTitle("编辑课程")
         layout = QVBoxLayout(dialog)
@@ -373,7 +421,9 @@ class MainWindow(QMainWindow):
         dialog.exec_()
 
     def choose_course_color(self, course, button):
-        """选择课程颜色"""
+        """选择课程颜色（只修改对话框中正在编辑的课程）"""
+        from PyQt5.QtWidgets import QColorDialog
+        
         color = QColorDialog.getColor()
         if color.isValid():
             course['color'] = color.name()
@@ -423,8 +473,19 @@ class MainWindow(QMainWindow):
             'name': name,
             'location': location,
             'teacher': teacher,
-            'color': '#3f51b5'
+            'color': '#3f51b5',
+            'weeks': f"1-{self.config.get('timetable.total_weeks', 20)}"
         }
+        
+        # 与已有课程时间冲突时提示
+        conflicts = self.timetable.check_conflicts(new_course)
+        if conflicts:
+            from PyQt5.QtWidgets import QMessageBox
+            names = '、'.join(course['name'] for course in conflicts)
+            reply = QMessageBox.question(dialog, "课程冲突", f"该时间已有课程: {names}\n仍然添加吗？")
+            if reply != QMessageBox.Yes:
+                return
+        
         self.timetable.add_course(new_course)
         self.load_timetable()
         dialog.close()
@@ -433,6 +494,7 @@ class MainWindow(QMainWindow):
         """保存课程修改"""
         course['name'] = name
         course['location'] = location
+        self.timetable.update_course(course['id'], course)
         dialog.close()
         self.load_timetable()
 
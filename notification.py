@@ -5,6 +5,8 @@ from PyQt5.QtWidgets import QSystemTrayIcon
 from PyQt5.QtGui import QIcon
 from loguru import logger
 
+from scheduler import ReminderScheduler
+
 class NotificationService:
     """通知服务类，用于提醒即将开始的课程"""
     def __init__(self, config):
@@ -12,76 +14,77 @@ class NotificationService:
         self.last_notification_time = {}
         self.notification_cooldown = 300  # 5分钟内不重复提醒同一课程
         
+        # 提醒调度器（按触发时间排序的最小堆）
+        self.scheduler = ReminderScheduler()
+        
         # 通知音效文件路径
         self.sound_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'notification.wav')
         
         logger.info("通知服务初始化完成")
     
-    def check_upcoming_classes(self, timetable):
-        """检查即将开始的课程并发送通知"""
+    def plan_reminders(self, timetable, now=None):
+        """规划今天剩余课程的提醒时间
+        
+        只需在课程、时间段或通知设置变化（以及日期变化）时调用，
+        之后由 fire_due_reminders 按最早的触发时间执行。
+        """
+        self.scheduler.clear()
+        notification_config = self.config.section('notification')
+        
         # 检查是否启用通知
-        if not self.config.get('notification.enable', True):
+        if not notification_config.get('enable', True):
             return
         
-        # 获取当前时间
-        now = datetime.datetime.now()
-        current_time = now.time()
+        if now is None:
+            now = datetime.datetime.now()
         current_weekday = now.weekday()  # 0-6 表示周一到周日
         
-        # 获取当前周的课程
+        # 获取今天的课程和时间段配置
         current_week = timetable.get_current_week()
-        courses = timetable.get_weekly_courses(current_week)
-        
-        # 获取时间段配置
+        courses = timetable.get_day_courses(current_week, current_weekday)
         time_slots = timetable.get_time_slots()
+        slot_table = timetable.get_slot_table()
         
         # 提前提醒时间（分钟）
-        advance_time = self.config.get('notification.advance_time', 10)
+        advance = datetime.timedelta(minutes=notification_config.get('advance_time', 10))
+        midnight = datetime.datetime.combine(now.date(), datetime.time())
         
         for course in courses:
-            # 检查课程是否在今天
-            if course.get('day') != current_weekday:
+            slot_index = course.get('slot', 0)
+            if slot_index >= len(slot_table):
                 continue
             
-            # 获取课程开始时间
-            slot_index = course.get('slot', 0)
-            if slot_index >= len(time_slots):
+            start_time_str = time_slots[slot_index].get('start', '00:00')
+            start_datetime = midnight + datetime.timedelta(minutes=slot_table.start_of(slot_index))
+            if start_datetime <= now:
+                # 课程已经开始，不再提醒
                 continue
-                
-            slot = time_slots[slot_index]
-            start_time_str = slot.get('start', '00:00')
             
-            # 解析开始时间
-            try:
-                start_time = datetime.datetime.strptime(start_time_str, '%H:%M').time()
-                
-                # 计算提醒时间
-                reminder_datetime = datetime.datetime.combine(now.date(), start_time) - datetime.timedelta(minutes=advance_time)
-                reminder_time = reminder_datetime.time()
-                
-                # 检查是否到了提醒时间
-                if self._is_time_between(current_time, reminder_time, start_time):
-                    # 检查是否在冷却期内
-                    course_id = course.get('id')
-                    if course_id in self.last_notification_time:
-                        last_time = self.last_notification_time[course_id]
-                        if (time.time() - last_time) < self.notification_cooldown:
-                            continue
-                    
-                    # 发送通知
-                    self._send_notification(course, start_time_str)
-                    
-                    # 更新最后通知时间
-                    self.last_notification_time[course_id] = time.time()
-            except Exception as e:
-                logger.error(f"处理课程通知时出错: {e}")
+            # 已处于提醒时间段内的课程立即提醒
+            fire_at = max(start_datetime - advance, now)
+            self.scheduler.push(fire_at, (course, start_time_str, start_datetime))
+        
+        logger.info(f"已规划{len(self.scheduler)}个课程提醒")
     
-    def _is_time_between(self, current, start, end):
-        """检查当前时间是否在指定的时间范围内"""
-        if start <= end:
-            return start <= current <= end
-        else:  # 跨越午夜的情况
-            return start <= current or current <= end
+    def fire_due_reminders(self, now=None):
+        """发送所有已到触发时间的提醒"""
+        if now is None:
+            now = datetime.datetime.now()
+        
+        for course, start_time_str, start_datetime in self.scheduler.pop_due(now):
+            # 定时器延迟过久，课程已经开始
+            if now > start_datetime:
+                continue
+            
+            # 检查是否在冷却期内
+            course_id = course.get('id')
+            if course_id in self.last_notification_time:
+                last_time = self.last_notification_time[course_id]
+                if (time.time() - last_time) < self.notification_cooldown:
+                    continue
+            
+            self._send_notification(course, start_time_str)
+            self.last_notification_time[course_id] = time.time()
     
     def _send_notification(self, course, start_time):
         """发送课程通知"""
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import atexit
+import tempfile
+import threading
+from loguru import logger
+
+
+def write_bytes_atomic(path, data):
+    """原子写入文件：先写临时文件，再重命名覆盖目标文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def encode_json(data, indent=4):
+    """将数据编码为 JSON 字节串"""
+    return json.dumps(data, ensure_ascii=False, indent=indent).encode('utf-8')
+
+
+def write_json_atomic(path, data, indent=4):
+    """原子写入 JSON 文件"""
+    write_bytes_atomic(path, encode_json(data, indent))
+
+
+class PersistenceService:
+    """延迟写入服务
+
+    同一文件在 delay 秒内的多次保存合并为一次写入，由后台线程原子写入；
+    连续保存时最多推迟 max_delay 秒。程序退出时写入所有未保存的数据。
+    数据在调用 save 时就编码为 JSON，之后调用者修改数据不会影响写入的内容。
+    """
+    def __init__(self, delay=0.5, max_delay=5.0):
+        self.delay = delay
+        self.max_delay = max_delay
+
+        # 文件路径 -> [数据, 缩进, 计划写入时间, 首次请求时间, 写入完成回调列表]
+        self._pending = {}
+        self._cond = threading.Condition()
+        # 保证同一时间只有一个线程在取出并写入数据，写入顺序与保存顺序一致
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    def save(self, path, data, indent=4, callback=None):
+        """请求保存数据，data 可以是数据本身（立即编码），也可以是在写入时调用以生成数据的函数
+
+        生成数据的函数在写入线程中调用，只能读取文件等不会被其他线程修改的数据。
+        callback(ok) 在数据实际写入（或写入失败）后由写入线程调用，
+        被合并的多次保存的回调都会在同一次写入后调用。
+        """
+        if not callable(data):
+            try:
+                data = encode_json(data, indent)
+            except Exception as e:
+                logger.error(f"保存文件失败: {path}, {e}")
+                return False
+        now = time.monotonic()
+        with self._cond:
+            entry = self._pending.get(path)
+            first = entry[3] if entry is not None else now
+            due = min(now + self.delay, first + self.max_delay)
+            callbacks = entry[4] if entry is not None else []
+            if callback is not None:
+                callbacks.append(callback)
+            self._pending[path] = [data, indent, due, first, callbacks]
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='persistence', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return True
+
+    def has_pending(self, path=None):
+        """是否还有未写入的数据"""
+        with self._cond:
+            return bool(self._pending) if path is None else path in self._pending
+
+    def flush(self, path=None):
+        """立即写入所有（或指定文件）未保存的数据"""
+        with self._write_lock:
+            with self._cond:
+                if path is None:
+                    entries = list(self._pending.items())
+                    self._pending.clear()
+                elif path in self._pending:
+                    entries = [(path, self._pending.pop(path))]
+                else:
+                    entries = []
+            for path, (data, indent, _, _, callbacks) in entries:
+                self._write(path, data, indent, callbacks)
+
+    def _run(self):
+        """后台写入线程"""
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                wait = min(entry[2] for entry in self._pending.values()) - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+
+            with self._write_lock:
+                now = time.monotonic()
+                with self._cond:
+                    due = [(path, entry) for path, entry in self._pending.items() if entry[2] <= now]
+                    for path, _ in due:
+                        del self._pending[path]
+                for path, (data, indent, _, _, callbacks) in due:
+                    self._write(path, data, indent, callbacks)
+
+    def _write(self, path, data, indent, callbacks=()):
+        """生成数据并原子写入，然后通知回调"""
+        ok = self._write_data(path, data, indent)
+        for callback in callbacks:
+            try:
+                callback(ok)
+            except Exception as e:
+                logger.error(f"写入回调执行失败: {e}")
+        return ok
+
+    def _write_data(self, path, data, indent):
+        """生成数据并原子写入"""
+        try:
+            content = encode_json(data(), indent) if callable(data) else data
+            write_bytes_atomic(path, content)
+            logger.info(f"文件保存成功: {os.path.basename(path)}")
+            return True
+        except Exception as e:
+            logger.error(f"保存文件失败: {path}, {e}")
+            return False
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_persistence():
+    """获取全局共享的写入服务"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = PersistenceService()
+            atexit.register(_service.flush)
+        return _service
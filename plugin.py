@@ -5,6 +5,9 @@ import importlib.util
 from pathlib import Path
 from loguru import logger
 
+from http_client import get_client
+from persistence import get_persistence
+
 class PluginManager:
     """插件管理器，用于加载和管理插件"""
     def __init__(self, config):
@@ -17,6 +20,9 @@ class PluginManager:
         # 已加载的插件
         self.plugins = {}
         
+        # 时钟服务（由主窗口设置），插件定时任务通过它调度
+        self.clock = None
+        
         # 插件配置文件
         self.plugins_config_file = os.path.join(self.plugins_dir, 'plugins.json')
         
@@ -37,8 +43,7 @@ class PluginManager:
                     "enabled_plugins": [],
                     "plugin_settings": {}
                 }
-                with open(self.plugins_config_file, 'w', encoding='utf-8') as f:
-                    json.dump(default_config, f, ensure_ascii=False, indent=4)
+                get_persistence().save(self.plugins_config_file, default_config)
                 return default_config
         except Exception as e:
             logger.error(f"加载插件配置失败: {e}")
@@ -46,14 +51,8 @@ class PluginManager:
     
     def save_plugins_config(self):
         """保存插件配置"""
-        try:
-            with open(self.plugins_config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.plugins_config, f, ensure_ascii=False, indent=4)
-            logger.info("插件配置保存成功")
-            return True
-        except Exception as e:
-            logger.error(f"保存插件配置失败: {e}")
-            return False
+        # 由写入服务在后台合并、原子写入
+        return get_persistence().save(self.plugins_config_file, self.plugins_config)
     
     def discover_plugins(self):
         """发现可用的插件"""
@@ -92,6 +91,8 @@ class PluginManager:
     def load_plugins(self):
         """加载启用的插件"""
         # 清空已加载的插件
+        for plugin in self.plugins.values():
+            self._cancel_plugin_timers(plugin)
         self.plugins = {}
         
         # 获取启用的插件列表
@@ -124,6 +125,7 @@ class PluginManager:
             
             # 实例化插件
             plugin_instance = module.Plugin(self.config)
+            plugin_instance.clock = self.clock
             
             # 添加到已加载插件字典
             self.plugins[plugin_id] = plugin_instance
@@ -149,10 +151,20 @@ class PluginManager:
             self.plugins_config['enabled_plugins'].remove(plugin_id)
             self.save_plugins_config()
             if plugin_id in self.plugins:
+                self._cancel_plugin_timers(self.plugins[plugin_id])
                 del self.plugins[plugin_id]
             return True
         return False
     
+    def _cancel_plugin_timers(self, plugin):
+        """取消插件注册的定时任务"""
+        cancel_timers = getattr(plugin, 'cancel_timers', None)
+        if callable(cancel_timers):
+            try:
+                cancel_timers()
+            except Exception as e:
+                logger.error(f"取消插件定时任务失败: {e}")
+    
     def get_plugin_settings(self, plugin_id):
         """获取插件设置"""
         return self.plugins_config['plugin_settings'].get(plugin_id, {})
@@ -184,6 +196,15 @@ class PluginBase:
         self.version = "1.0.0"
         self.description = ""
         self.author = ""
+        
+        # 时钟服务由插件管理器在加载时设置
+        self.clock = None
+        self._timer_handles = []
+    
+    @property
+    def http(self):
+        """共享的 HTTP 客户端（连接池、条件请求、并发请求合并）"""
+        return get_client()
     
     def initialize(self):
         """初始化插件，在插件加载时调用"""
@@ -199,4 +220,28 @@ class PluginBase:
     
     def save_settings(self, settings):
         """保存插件设置"""
-        pass
\ No newline at end of file
+        pass
+    
+    def call_later(self, delay, callback):
+        """在 delay 秒后执行一次回调，插件卸载时自动取消"""
+        if self.clock is None:
+            logger.warning(f"插件{self.name}无法注册定时任务: 时钟服务不可用")
+            return None
+        handle = self.clock.call_later(delay, callback, name=f"{self.name}.{getattr(callback, '__name__', 'timer')}")
+        self._timer_handles.append(handle)
+        return handle
+    
+    def call_every(self, interval, callback, align=False):
+        """每隔 interval 秒执行一次回调，插件卸载时自动取消"""
+        if self.clock is None:
+            logger.warning(f"插件{self.name}无法注册定时任务: 时钟服务不可用")
+            return None
+        handle = self.clock.call_every(interval, callback, align=align, name=f"{self.name}.{getattr(callback, '__name__', 'timer')}")
+        self._timer_handles.append(handle)
+        return handle
+    
+    def cancel_timers(self):
+        """取消插件注册的所有定时任务"""
+        for handle in self._timer_handles:
+            self.clock.cancel(handle)
+        self._timer_handles = []
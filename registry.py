@@ -0,0 +1,169 @@
+import os
+import re
+import threading
+import contextlib
+from collections import OrderedDict
+from loguru import logger
+
+from config import Config
+from timetable import create_timetable
+from persistence import write_json_atomic
+
+# 课表（班级）ID 只允许字母、数字、下划线和短横线，直接用作目录名
+TENANT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class TimetableRegistry:
+    """多课表管理器
+
+    一个进程驱动多块班级屏幕时，每个班级有自己的课表，数据保存在 data/tenants/<班级ID>/ 下；
+    班级目录下的 config.json 只保存该班级与全局配置不同的配置项。
+    课表在第一次使用时加载，已加载课表的估算内存总和超过 budget_bytes 时，
+    按最近最少使用的顺序释放（关闭），最近使用的课表和 use() 中正在使用的课表始终保留。
+    get() 返回的课表随时可能被释放，不能长期持有；需要持续使用时用 with registry.use(班级ID)。
+    新班级需先用 create() 创建（空课表），get() 不会自动创建。
+    全局配置为只读时，各班级的配置和课表也以只读方式打开。
+    """
+    def __init__(self, config, root_dir=None, budget_bytes=64 * 1024 * 1024, factory=None):
+        self.config = config
+        self.root_dir = root_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'tenants')
+        self.budget_bytes = budget_bytes
+        self.factory = factory or self._create_timetable
+
+        # 班级ID -> (课表, 估算内存)，按使用顺序排列，最近使用的在最后
+        self._loaded = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+
+        # 班级ID -> 正在使用该课表的 use() 数量
+        self._pins = {}
+
+        # 统计信息
+        self.stats = {'hits': 0, 'loads': 0, 'evictions': 0}
+
+    def get(self, tenant_id):
+        """获取班级的课表，未加载时加载，班级不存在时抛出 KeyError"""
+        with self._lock:
+            entry = self._loaded.get(tenant_id)
+            if entry is not None:
+                self._loaded.move_to_end(tenant_id)
+                self.stats['hits'] += 1
+                return entry[0]
+
+            tenant_dir = self.tenant_dir(tenant_id)
+            if not self.exists(tenant_id):
+                raise KeyError(tenant_id)
+            config = Config(read_only=self.config.read_only, config_dir=tenant_dir, base=self.config)
+            timetable = self.factory(config, tenant_dir)
+            size = timetable.memory_usage()
+            self._loaded[tenant_id] = (timetable, size)
+            self._total_bytes += size
+            self.stats['loads'] += 1
+            logger.info(f"加载课表: {tenant_id}, 约{size // 1024}KB")
+
+            self._evict()
+            return timetable
+
+    @contextlib.contextmanager
+    def use(self, tenant_id):
+        """在 with 块中使用班级的课表，期间不会因超出内存预算被释放"""
+        with self._lock:
+            timetable = self.get(tenant_id)
+            self._pins[tenant_id] = self._pins.get(tenant_id, 0) + 1
+        try:
+            yield timetable
+        finally:
+            with self._lock:
+                self._pins[tenant_id] -= 1
+                if not self._pins[tenant_id]:
+                    del self._pins[tenant_id]
+                self._evict()
+
+    def create(self, tenant_id):
+        """创建班级（空课表）并返回其课表，班级已存在时抛出 FileExistsError"""
+        with self._lock:
+            if self.exists(tenant_id):
+                raise FileExistsError(f"班级已存在: {tenant_id}")
+            tenant_dir = self.tenant_dir(tenant_id)
+            os.makedirs(tenant_dir, exist_ok=True)
+            write_json_atomic(os.path.join(tenant_dir, 'courses.json'), {'courses': []})
+            logger.info(f"创建班级课表: {tenant_id}")
+            return self.get(tenant_id)
+
+    def exists(self, tenant_id):
+        """班级是否已有课表数据（班级ID无效时为 False）"""
+        if not isinstance(tenant_id, str) or not TENANT_ID_PATTERN.match(tenant_id):
+            return False
+        tenant_dir = self.tenant_dir(tenant_id)
+        return any(os.path.isfile(os.path.join(tenant_dir, name)) for name in ('courses.json', 'courses.db'))
+
+    def tenant_dir(self, tenant_id):
+        """班级课表的数据目录"""
+        if not isinstance(tenant_id, str) or not TENANT_ID_PATTERN.match(tenant_id):
+            raise ValueError(f"无效的班级ID: {tenant_id!r}")
+        return os.path.join(self.root_dir, tenant_id)
+
+    def tenants(self):
+        """所有已有数据的班级ID"""
+        if not os.path.isdir(self.root_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root_dir)
+            if TENANT_ID_PATTERN.match(name) and self.exists(name)
+        )
+
+    def loaded(self):
+        """已加载的班级ID（从最久未使用到最近使用）"""
+        with self._lock:
+            return list(self._loaded)
+
+    def memory_usage(self):
+        """已加载课表的估算内存总和（字节）"""
+        with self._lock:
+            return self._total_bytes
+
+    def refresh_usage(self, tenant_id):
+        """课表内容大幅变化（如批量导入）后重新估算内存"""
+        with self._lock:
+            entry = self._loaded.get(tenant_id)
+            if entry is None:
+                return
+            timetable, old_size = entry
+            size = timetable.memory_usage()
+            self._loaded[tenant_id] = (timetable, size)
+            self._total_bytes += size - old_size
+            self._evict()
+
+    def unload(self, tenant_id):
+        """释放班级的课表"""
+        with self._lock:
+            entry = self._loaded.pop(tenant_id, None)
+            if entry is None:
+                return False
+            timetable, size = entry
+            self._total_bytes -= size
+        try:
+            timetable.close()
+        except Exception as e:
+            logger.error(f"释放课表失败: {tenant_id}, {e}")
+        logger.info(f"释放课表: {tenant_id}")
+        return True
+
+    def close(self):
+        """释放所有课表"""
+        for tenant_id in self.loaded():
+            self.unload(tenant_id)
+
+    def _create_timetable(self, config, data_dir):
+        """默认的课表工厂"""
+        return create_timetable(config, data_dir, read_only=config.read_only)
+
+    def _evict(self):
+        """超出内存预算时释放最久未使用的课表（跳过正在使用的课表）"""
+        for tenant_id in list(self._loaded)[:-1]:
+            if self._total_bytes <= self.budget_bytes:
+                break
+            if tenant_id in self._pins:
+                continue
+            self.unload(tenant_id)
+            self.stats['evictions'] += 1
@@ -0,0 +1,119 @@
+import heapq
+import itertools
+import math
+from loguru import logger
+
+
+class ReminderScheduler:
+    """提醒调度器，用最小堆按触发时间保存待发送的提醒"""
+    def __init__(self):
+        self._heap = []
+        # 触发时间相同时按加入顺序排列，避免比较负载数据
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def clear(self):
+        """清空所有待触发的提醒"""
+        self._heap = []
+
+    def push(self, fire_at, payload):
+        """加入一个提醒，fire_at 为 datetime"""
+        heapq.heappush(self._heap, (fire_at, next(self._counter), payload))
+
+    def next_fire_time(self):
+        """获取最早的触发时间，没有提醒时返回 None"""
+        if not self._heap:
+            return None
+        return self._heap[0][0]
+
+    def pop_due(self, now):
+        """弹出所有触发时间不晚于 now 的提醒"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[2])
+        return due
+
+
+class TimerHandle:
+    """定时任务句柄，可用于取消任务"""
+    def __init__(self, deadline, callback, interval=None, name=None):
+        self.deadline = deadline
+        self.callback = callback
+        self.interval = interval  # 重复任务的间隔（秒），单次任务为 None
+        self.name = name or getattr(callback, '__name__', 'timer')
+        self.cancelled = False
+
+    def cancel(self):
+        """取消任务"""
+        self.cancelled = True
+
+
+class TimerWheel:
+    """分桶定时器（时间轮）
+
+    按 resolution 秒的刻度将任务分桶，落在同一刻度内的任务在一次唤醒中执行，
+    调用方只需为最早的非空刻度设置一个定时器。
+    """
+    def __init__(self, resolution=0.25):
+        self.resolution = resolution
+        self._buckets = {}  # 刻度 -> 任务列表
+        self._ticks = []  # 非空刻度组成的最小堆
+
+    def __len__(self):
+        return sum(1 for bucket in self._buckets.values() for handle in bucket if not handle.cancelled)
+
+    def _tick_of(self, deadline):
+        """截止时间向上取整到刻度，保证任务不会提前执行"""
+        return math.ceil(deadline / self.resolution - 1e-9)
+
+    def schedule(self, deadline, callback, interval=None, name=None):
+        """在 deadline（时间戳，秒）执行 callback，返回任务句柄"""
+        handle = TimerHandle(deadline, callback, interval, name)
+        self._add(handle)
+        return handle
+
+    def _add(self, handle):
+        tick = self._tick_of(handle.deadline)
+        bucket = self._buckets.get(tick)
+        if bucket is None:
+            self._buckets[tick] = bucket = []
+            heapq.heappush(self._ticks, tick)
+        bucket.append(handle)
+
+    def next_deadline(self):
+        """最早的非空刻度对应的时间，没有任务时返回 None"""
+        while self._ticks:
+            tick = self._ticks[0]
+            if any(not handle.cancelled for handle in self._buckets[tick]):
+                return tick * self.resolution
+            # 整桶都已取消，直接丢弃
+            heapq.heappop(self._ticks)
+            del self._buckets[tick]
+        return None
+
+    def advance(self, now):
+        """执行所有到期的任务，返回到期任务句柄列表"""
+        due = []
+        while self._ticks and self._ticks[0] * self.resolution <= now:
+            tick = heapq.heappop(self._ticks)
+            due.extend(self._buckets.pop(tick))
+
+        for handle in due:
+            if handle.cancelled:
+                continue
+
+            # 重复任务按原定的截止时间推进，不累积误差；落后太多时跳过错过的周期
+            if handle.interval:
+                missed = max(0, math.floor((now - handle.deadline) / handle.interval))
+                handle.deadline += (missed + 1) * handle.interval
+                self._add(handle)
+            else:
+                handle.cancelled = True
+
+            try:
+                handle.callback()
+            except Exception as e:
+                logger.error(f"定时任务{handle.name}执行失败: {e}")
+        return due
@@ -0,0 +1,263 @@
+import sys
+import json
+import time
+import asyncio
+import argparse
+import datetime
+from urllib.parse import urlsplit, parse_qs
+from loguru import logger
+
+from config import Config
+from timetable import create_timetable
+from registry import TimetableRegistry
+
+# HTTP 状态码说明
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+# 请求头最大长度
+MAX_HEADER_SIZE = 16 * 1024
+
+# 响应缓存的最大条目数
+MAX_CACHE_ENTRIES = 512
+
+# 检查课程文件是否被其他进程修改的最小间隔（秒）
+REFRESH_INTERVAL = 1.0
+
+
+class QueryServer:
+    """无界面的课表查询服务（asyncio HTTP）
+
+    供班牌、校园网等只需要 JSON 数据的场景使用，不依赖 PyQt：
+        GET /today              今天的课程
+        GET /next               下一节课
+        GET /week[?week=N]      本周（或第 N 周）的课程
+        GET /day?week=N&day=D   第 N 周星期 D（0-6）的课程
+    课程列表按 (周, 星期) 缓存编码好的响应，课程修改后缓存自动失效；
+    其他进程（如界面）修改课程文件后，由之后到达的请求触发在后台线程重新加载（最多每 REFRESH_INTERVAL 秒检查一次）。
+    """
+    def __init__(self, timetable, host='127.0.0.1', port=8765):
+        self.timetable = timetable
+        self.host = host
+        self.port = port
+        self.server = None
+
+        # (周, 星期) -> 响应内容，星期为 None 表示整周
+        self._cache = {}
+        self._cache_version = None
+        self._last_refresh = time.monotonic()
+        self._refresh_task = None
+
+        # 统计信息
+        self.stats = {'requests': 0, 'cache_hits': 0, 'errors': 0}
+
+    async def start(self):
+        """开始监听"""
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # 端口为 0 时使用系统分配的端口
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"课表查询服务已启动: http://{self.host}:{self.port}")
+        return self.server
+
+    async def serve_forever(self):
+        """启动并一直运行"""
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def stop(self):
+        """停止服务"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    def clear_cache(self):
+        """清空响应缓存"""
+        self._cache = {}
+        self._cache_version = self.timetable.version
+
+    async def _handle_connection(self, reader, writer):
+        """处理一个连接（支持 keep-alive）"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._send(writer, 400, self._error_body("请求头过长"), keep_alive=False)
+                    break
+                if len(head) > MAX_HEADER_SIZE:
+                    await self._send(writer, 400, self._error_body("请求头过长"), keep_alive=False)
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    await self._send(writer, 400, self._error_body("无效的请求"), keep_alive=False)
+                    break
+
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                # 查询接口不需要请求体，读取后丢弃
+                length = int(headers.get('content-length', 0) or 0)
+                if length:
+                    await reader.readexactly(length)
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' and (version == 'HTTP/1.1' or connection == 'keep-alive')
+
+                self._schedule_refresh()
+                status, body = self.handle_request(method, target)
+                await self._send(writer, status, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            logger.error(f"处理连接失败: {e}")
+        finally:
+            writer.close()
+
+    async def _send(self, writer, status, body, keep_alive):
+        """发送响应"""
+        head = (
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    def handle_request(self, method, target):
+        """处理请求，返回 (状态码, 响应内容)"""
+        self.stats['requests'] += 1
+        if method != 'GET':
+            return 405, self._error_body("只支持 GET 请求")
+
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            if url.path == '/today':
+                now = datetime.datetime.now()
+                return 200, self._courses_body(self.timetable.get_current_week(), now.weekday())
+            if url.path == '/week':
+                week = int(query['week']) if 'week' in query else self.timetable.get_current_week()
+                if not self._valid_week(week):
+                    return 400, self._error_body(f"周次应为1-{self._total_weeks()}")
+                return 200, self._courses_body(week, None)
+            if url.path == '/day':
+                week = int(query['week']) if 'week' in query else self.timetable.get_current_week()
+                day = int(query['day']) if 'day' in query else datetime.datetime.now().weekday()
+                if not self._valid_week(week):
+                    return 400, self._error_body(f"周次应为1-{self._total_weeks()}")
+                if not 0 <= day <= 6:
+                    return 400, self._error_body("星期应为0-6")
+                return 200, self._courses_body(week, day)
+            if url.path == '/next':
+                # 取决于当前时间，不缓存
+                return 200, self._encode({'course': self.timetable.get_next_course()})
+            return 404, self._error_body("未知的接口")
+        except ValueError:
+            return 400, self._error_body("参数无效")
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"查询失败: {target}, {e}")
+            return 500, self._error_body("查询失败")
+
+    def _schedule_refresh(self):
+        """定期在后台检查课程数据是否被其他进程修改（不阻塞正在处理的请求）"""
+        now = time.monotonic()
+        if now - self._last_refresh < REFRESH_INTERVAL:
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._last_refresh = now
+        self._refresh_task = asyncio.get_running_loop().create_task(self.refresh())
+
+    async def refresh(self):
+        """在线程池中检查并加载课程数据（可能需要等待其他进程的文件锁），完成后在事件循环中换入"""
+        try:
+            loop = asyncio.get_running_loop()
+            state = await loop.run_in_executor(None, self.timetable.prepare_refresh)
+            if state is not None:
+                self.timetable.apply_refresh(state)
+        except Exception as e:
+            logger.error(f"重新加载课程数据失败: {e}")
+
+    def _total_weeks(self):
+        return self.timetable.config.get('timetable.total_weeks', 20)
+
+    def _valid_week(self, week):
+        """周次是否在 1 到总周数之间"""
+        return 1 <= week <= self._total_weeks()
+
+    def _courses_body(self, week, day):
+        """获取 (周, 星期) 的课程响应，优先使用缓存"""
+        if self._cache_version != self.timetable.version:
+            self.clear_cache()
+
+        key = (week, day)
+        body = self._cache.get(key)
+        if body is not None:
+            self.stats['cache_hits'] += 1
+            return body
+
+        if day is None:
+            courses = self.timetable.get_weekly_courses(week)
+        else:
+            courses = self.timetable.get_day_courses(week, day)
+        body = self._encode({'week': week, 'day': day, 'courses': courses})
+        if len(self._cache) >= MAX_CACHE_ENTRIES:
+            # 丢弃最早缓存的响应
+            del self._cache[next(iter(self._cache))]
+        self._cache[key] = body
+        return body
+
+    def _encode(self, data):
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    def _error_body(self, message):
+        return self._encode({'error': message})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="课表查询服务（无界面）")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址")
+    parser.add_argument('--port', type=int, default=8765, help="监听端口")
+    parser.add_argument('--tenant', help="班级ID（多课表时提供该班级的课表）")
+    args = parser.parse_args(argv)
+
+    # 查询服务只读取课表，不写入配置和课程数据
+    config = Config(read_only=True)
+    if not args.tenant:
+        return run(QueryServer(create_timetable(config, read_only=True), args.host, args.port))
+
+    registry = TimetableRegistry(config)
+    if not registry.exists(args.tenant):
+        logger.error(f"班级不存在: {args.tenant}")
+        return 1
+    try:
+        with registry.use(args.tenant) as timetable:
+            return run(QueryServer(timetable, args.host, args.port))
+    finally:
+        registry.close()
+
+
+def run(server):
+    """运行查询服务直到被中断"""
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        logger.info("课表查询服务已停止")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import bisect
+from loguru import logger
+
+
+def parse_minutes(time_str):
+    """将 'HH:MM' 解析为当天的分钟数"""
+    hour, minute = time_str.split(':')
+    hour, minute = int(hour), int(minute)
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"无效的时间: {time_str}")
+    return hour * 60 + minute
+
+
+class SlotTable:
+    """预解析的时间段表，开始/结束时间以当天分钟数保存，支持二分查找"""
+    def __init__(self, time_slots):
+        self.names = []
+        self.starts = []
+        self.ends = []
+
+        for i, slot in enumerate(time_slots):
+            try:
+                start = parse_minutes(slot.get('start', '00:00'))
+                end = parse_minutes(slot.get('end', '00:00'))
+            except Exception as e:
+                logger.error(f"解析第{i + 1}个时间段失败: {e}")
+                start = end = 0
+
+            self.names.append(slot.get('name', f"第{i + 1}节"))
+            self.starts.append(start)
+            self.ends.append(end)
+
+        # 时间段按开始和结束时间升序排列时才能二分查找
+        self.ordered = all(
+            self.starts[i] <= self.starts[i + 1] and self.ends[i] <= self.ends[i + 1]
+            for i in range(len(self.starts) - 1)
+        )
+
+    def __len__(self):
+        return len(self.starts)
+
+    def start_of(self, slot):
+        """第 slot 个时间段的开始时间（分钟）"""
+        return self.starts[slot]
+
+    def end_of(self, slot):
+        """第 slot 个时间段的结束时间（分钟）"""
+        return self.ends[slot]
+
+    def current_slot(self, minute):
+        """获取 minute 所在的时间段索引，不在任何时间段内时返回 None"""
+        if self.ordered:
+            i = bisect.bisect_right(self.starts, minute) - 1
+            if i >= 0 and minute < self.ends[i]:
+                return i
+            return None
+
+        for i, (start, end) in enumerate(zip(self.starts, self.ends)):
+            if start <= minute < end:
+                return i
+        return None
+
+    def next_slot(self, minute):
+        """获取 minute 之后开始的第一个时间段索引，没有时返回 None"""
+        if self.ordered:
+            i = bisect.bisect_right(self.starts, minute)
+            return i if i < len(self.starts) else None
+
+        candidates = [i for i, start in enumerate(self.starts) if start > minute]
+        return min(candidates, key=lambda i: self.starts[i]) if candidates else None
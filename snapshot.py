@@ -0,0 +1,83 @@
+import os
+import json
+import hashlib
+from loguru import logger
+
+from persistence import write_bytes_atomic
+
+# 快照格式版本，数据结构变化时递增，旧快照自动失效
+SNAPSHOT_VERSION = 2
+
+
+def _stat_signature(paths):
+    """源文件的 (修改时间, 大小) 签名，文件不存在时为 None"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append([stat.st_mtime_ns, stat.st_size])
+        except FileNotFoundError:
+            signature.append(None)
+    return signature
+
+
+def _content_hash(paths):
+    """源文件内容的哈希"""
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        except FileNotFoundError:
+            digest.update(b'\0missing\0')
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def load_snapshot(path, sources, key=None):
+    """读取快照，快照缺失、损坏或与源文件不一致时返回 None
+
+    源文件的修改时间和大小都未变化时直接使用快照；
+    否则比较内容哈希，只是修改时间变化（内容相同）时快照仍然有效。
+    key 为其他影响快照内容的数据（如时间段配置），不相等时快照失效。
+    快照为 JSON 格式，只包含普通数据，读取时不会执行任何代码。
+    """
+    try:
+        with open(path, 'rb') as f:
+            snapshot = json.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"读取快照失败: {os.path.basename(path)}, {e}")
+        return None
+
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+    if snapshot.get('key') != _normalize(key):
+        return None
+    if snapshot.get('signature') != _stat_signature(sources):
+        if snapshot.get('hash') != _content_hash(sources):
+            return None
+    return snapshot.get('payload')
+
+
+def _normalize(value):
+    """转换为与从 JSON 读出时相同的形式（元组变为列表）"""
+    return json.loads(json.dumps(value, ensure_ascii=False))
+
+
+def save_snapshot(path, sources, payload, key=None):
+    """写入快照，记录源文件当前的签名和内容哈希（payload 只能包含 JSON 支持的数据）"""
+    try:
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'key': key,
+            'signature': _stat_signature(sources),
+            'hash': _content_hash(sources),
+            'payload': payload,
+        }
+        write_bytes_atomic(path, json.dumps(snapshot, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        return True
+    except Exception as e:
+        logger.warning(f"保存快照失败: {os.path.basename(path)}, {e}")
+        return False
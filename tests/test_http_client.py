@@ -0,0 +1,120 @@
+import os
+import sys
+import gzip
+import time
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_client import HttpClient
+
+BODY = '{"weatherinfo": {"city": "北京", "temp": "21"}}'.encode('utf-8')
+GZIP_BODY = gzip.compress(BODY * 20)
+ETAG = '"v1"'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """返回固定内容的测试接口，/slow 延迟响应，/gzip 返回 gzip 压缩的内容，If-None-Match 匹配时返回 304
+
+    server.sent 累计发送的响应体字节数。
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.hits.append(self.path)
+        if self.path == '/slow':
+            time.sleep(0.3)
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.send_header('ETag', ETAG)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = GZIP_BODY if self.path == '/gzip' else BODY
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if self.path == '/gzip':
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('ETag', ETAG)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.sent_lock:
+            self.server.sent += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HttpClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.hits = []
+        self.server.sent = 0
+        self.server.sent_lock = threading.Lock()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.client = HttpClient()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_concurrent_requests_are_coalesced(self):
+        results = []
+        barrier = threading.Barrier(5)
+
+        def worker():
+            barrier.wait()
+            results.append(self.client.get(self.base + '/slow').content)
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [BODY] * 5)
+        self.assertEqual(self.server.hits, ['/slow'])
+        self.assertEqual(self.client.stats['requests'], 1)
+        self.assertEqual(self.client.stats['coalesced'], 4)
+
+    def test_etag_304_served_from_cache(self):
+        first = self.client.get(self.base + '/data')
+        second = self.client.get(self.base + '/data')
+
+        self.assertFalse(first.not_modified)
+        self.assertTrue(second.not_modified)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, BODY)
+        self.assertEqual(second.json()['weatherinfo']['city'], '北京')
+        self.assertEqual(self.server.hits, ['/data', '/data'])
+        self.assertEqual(self.client.stats['requests'], 2)
+        self.assertEqual(self.client.stats['not_modified'], 1)
+
+    def test_byte_counts(self):
+        self.client.get(self.base + '/a')
+        self.client.get(self.base + '/b')
+        # 304 响应不计入下载字节数
+        self.client.get(self.base + '/a')
+
+        self.assertEqual(self.client.stats['bytes'], 2 * len(BODY))
+        self.assertEqual(self.client.stats['bytes'], self.server.sent)
+
+    def test_gzip_response(self):
+        response = self.client.get(self.base + '/gzip')
+
+        self.assertEqual(response.content, BODY * 20)
+        # 下载字节数按压缩后的大小计算
+        self.assertEqual(self.server.sent, len(GZIP_BODY))
+        self.assertEqual(self.client.stats['bytes'], len(GZIP_BODY))
+        self.assertLess(len(GZIP_BODY), len(BODY) * 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from timetable import TimeTable
+from persistence import get_persistence
+
+
+def _course(name, day=0, slot=0):
+    return {'name': name, 'day': day, 'slot': slot, 'weeks': [1]}
+
+
+class CourseJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.config = Config(config_dir=self.data_dir)
+        self.timetables = []
+
+    def tearDown(self):
+        for timetable in self.timetables:
+            timetable.close()
+        get_persistence().flush()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def open(self):
+        timetable = TimeTable(self.config, self.data_dir)
+        self.timetables.append(timetable)
+        return timetable
+
+    def reopen(self, *timetables):
+        """关闭课表、写入所有待保存的数据后重新打开"""
+        for timetable in timetables:
+            timetable.close()
+            self.timetables.remove(timetable)
+        get_persistence().flush()
+        return self.open()
+
+    def course_id(self, timetable, name):
+        return next(course['id'] for course in timetable.get_all_courses() if course['name'] == name)
+
+    def names(self, timetable):
+        return sorted(course['name'] for course in timetable.get_all_courses() if course['name'].startswith('t-'))
+
+    def test_replay_after_restart(self):
+        timetable = self.open()
+        get_persistence().flush()
+        timetable.add_course(_course('t-a'))
+        timetable.add_course(_course('t-b', slot=1))
+        timetable.add_course(_course('t-c', slot=2))
+        first = self.course_id(timetable, 't-a')
+        timetable.update_course(first, dict(_course('t-a'), location='101'))
+        timetable.delete_course(self.course_id(timetable, 't-c'))
+
+        # 只写了修改日志，courses.json 仍是打开时的内容
+        self.assertTrue(os.path.getsize(timetable.journal.path) > 0)
+        timetable = self.reopen(timetable)
+
+        self.assertEqual(self.names(timetable), ['t-a', 't-b'])
+        self.assertEqual(timetable.get_course(first)['location'], '101')
+        ids = [course['id'] for course in timetable.get_all_courses()]
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_compaction_with_non_owner_writer(self):
+        owner = self.open()
+        get_persistence().flush()
+        other = self.open()
+        self.assertTrue(owner.journal.owner)
+        self.assertFalse(other.journal.owner)
+        owner.journal.compact_threshold = 3
+
+        other.add_course(_course('t-other1'))
+        for i in range(4):
+            owner.add_course(_course(f't-owner{i}', day=1, slot=i))
+        get_persistence().flush()
+        # 合并后非写入者继续写入新的日志段，并能看到写入者的修改
+        other.add_course(_course('t-other2', slot=1))
+        self.assertEqual(len(self.names(other)), 6)
+
+        timetable = self.reopen(owner, other)
+        self.assertEqual(
+            self.names(timetable),
+            ['t-other1', 't-other2', 't-owner0', 't-owner1', 't-owner2', 't-owner3']
+        )
+        ids = [course['id'] for course in timetable.get_all_courses()]
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_resume_with_leftover_rotated_segment(self):
+        timetable = self.open()
+        get_persistence().flush()
+        timetable.add_course(_course('t-a'))
+        timetable.add_course(_course('t-b', slot=1))
+        timetable.close()
+        self.timetables.remove(timetable)
+
+        # 模拟合并途中退出：日志已转为待合并日志段，之后又有新的修改
+        journal_path = os.path.join(self.data_dir, 'courses.journal')
+        os.replace(journal_path, journal_path + '.old')
+        timetable = self.open()
+        timetable.add_course(_course('t-c', slot=2))
+        self.assertEqual(self.names(timetable), ['t-a', 't-b', 't-c'])
+
+        # 写入者打开时合并上次遗留的日志段，写入完成后删除该日志段
+        timetable = self.reopen(timetable)
+        get_persistence().flush()
+        self.assertEqual(self.names(timetable), ['t-a', 't-b', 't-c'])
+        self.assertFalse(os.path.exists(journal_path + '.old'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,22 +1,37 @@
 import os
+import sys
+import copy
 import json
 import datetime
 from datetime import timedelta
 from pathlib import Path
 from loguru import logger
 
+from persistence import get_persistence
+from journal import CourseJournal
+from snapshot import load_snapshot, save_snapshot
+from course_import import ImportResult, read_courses
+from conflicts import ConflictIndex
+
+from weeks import parse_weeks, format_weeks, weeks_to_list, iter_weeks, has_week
+from slots import SlotTable
+from colors import ColorResolver
+
 class TimeTable:
-    """课表管理类"""
-    def __init__(self, config):
+    """课表管理类
+    
+    read_only 为 True 时只读取课程：不成为日志写入者，不生成快照、不合并或清空日志，
+    也不能修改课程（命令行查询、查询服务等只读入口使用）。
+    """
+    def __init__(self, config, data_dir=None, read_only=False):
         self.config = config
+        self.read_only = read_only
         
-        # 确保课表数据目录存在
-        self.data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+        # 课表数据目录，默认为程序目录下的 data（多课表时每个课表使用单独的目录）
+        self.data_dir = data_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+        os.makedirs(self.data_dir, exist_ok=True)
         self.courses_file = os.path.join(self.data_dir, 'courses.json')
         
-        # 加载课程数据
-        self.courses = self.load_courses()
-        
         # 颜色映射（为不同课程分配不同颜色）
         self.color_map = {
             '数学': '#3f51b5',  # 蓝色
@@ -34,40 +49,303 @@ class TimeTable:
             '信息': '#03a9f4',  # 浅蓝色
             '通用技术': '#8bc34a',  # 浅绿色
         }
+        self.color_resolver = ColorResolver(self.color_map)
+        
+        # 已解析的学期开始日期
+        self._start_date_str = None
+        self._start_date = None
+        
+        # 预解析的时间段表，时间段配置变化时重新编译
+        self._slot_source = None
+        self.slot_table = None
+        self.reload_time_slots()
+        self._config_listener = self.config.subscribe('timetable.time_slots', lambda changed_keys: self.reload_time_slots())
+        
+        # 课程数据版本，每次修改加一（用于判断查询结果缓存是否过期）
+        self.version = 0
+        
+        # 课程冲突索引，第一次查询冲突时建立，之后随课程修改增量更新
+        self._conflict_index = None
+        self._conflict_version = None
+        
+        # 课程修改日志，单次修改只追加一行
+        self.journal = CourseJournal(os.path.join(self.data_dir, 'courses.journal'))
+        # 同一份课表只有一个进程负责合并日志（通常是界面进程）
+        if not self.read_only:
+            self.journal.acquire_writer()
+        
+        # 解析并建立索引后的课程快照，启动时一次读取
+        self.snapshot_file = os.path.join(self.data_dir, 'courses.snapshot')
+        
+        # 加载课程数据
+        self.open_storage()
         
         logger.info("课表管理器初始化完成")
     
+    def open_storage(self):
+        """加载课程数据并建立索引（其他存储后端覆盖此方法）"""
+        # 加载前记录课程文件的签名，之后据此发现其他进程的修改
+        self._courses_signature = self._file_signature()
+        
+        # 快照与课程文件一致时跳过 JSON 解析和建立索引
+        if self.load_snapshot():
+            self.build_id_map()
+            # 快照不包含修改日志的状态，恢复记录数，日志已足够长时照常合并
+            self.journal.mark_synced()
+            if self.journal.needs_compaction():
+                self.compact_courses()
+            return
+        
+        self.courses = self.load_courses()
+        
+        # 课程ID -> 在课程列表中的位置
+        self.course_positions = {}
+        self.build_id_map()
+        
+        # (周, 星期) -> 按时间段排序的课程列表
+        self.course_index = {}
+        self.build_course_index()
+        
+        # 上次运行留下的修改记录由写入者合并到 courses.json，没有修改记录时为当前数据生成快照
+        if self.read_only:
+            return
+        if self.journal.has_pending():
+            if self.journal.owner:
+                self.compact_courses()
+        else:
+            self.save_snapshot()
+    
+    def close(self):
+        """释放课表：取消配置订阅，写入尚未保存的课程数据并关闭修改日志"""
+        self.config.unsubscribe(self._config_listener)
+        get_persistence().flush(self.courses_file)
+        self.journal.close()
+    
+    def _file_signature(self):
+        """课程文件的 (inode, 修改时间, 大小)，文件不存在时为 None"""
+        try:
+            stat = os.stat(self.courses_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+    
+    def sync_storage(self):
+        """其他进程修改过课程数据时重新加载（需持有日志文件锁），返回是否重新加载"""
+        if self.journal.in_sync():
+            return False
+        return self.reload_courses()
+    
+    def refresh(self):
+        """课程文件或修改日志有变化时重新加载（只读的查询服务定期调用），返回是否重新加载"""
+        state = self.prepare_refresh()
+        return state is not None and self.apply_refresh(state)
+    
+    def prepare_refresh(self):
+        """检查课程文件或修改日志是否有变化，有变化时另行加载课程数据并建立索引，无变化时返回 None
+        
+        不修改当前的课程数据，可在后台线程调用；返回值交给 apply_refresh 换入。
+        """
+        with self.journal.lock:
+            signature = self._file_signature()
+            if self.journal.in_sync() and signature == self._courses_signature:
+                return None
+            state = copy.copy(self)
+            state._courses_signature = signature
+            self.journal.diverged = False
+            state.courses = state.load_courses()
+        state.build_id_map()
+        state.build_course_index()
+        return state
+    
+    def apply_refresh(self, state):
+        """换入 prepare_refresh 加载的课程数据"""
+        logger.info("课程数据已被其他进程修改，重新加载")
+        for name in ('courses', 'course_positions', 'course_index', 'week_masks', '_courses_signature'):
+            setattr(self, name, getattr(state, name))
+        self.version += 1
+        return True
+    
+    def reload_courses(self):
+        """重新加载课程数据并重建索引"""
+        logger.info("课程数据已被其他进程修改，重新加载")
+        self._courses_signature = self._file_signature()
+        self.journal.diverged = False
+        self.courses = self.load_courses()
+        self.build_id_map()
+        self.build_course_index()
+        self.version += 1
+        return True
+    
+    def memory_usage(self):
+        """估算课程数据和索引占用的内存（字节）"""
+        size = sys.getsizeof(self.courses)
+        course_list = self.courses.get('courses', [])
+        size += sys.getsizeof(course_list)
+        for course in course_list:
+            size += sys.getsizeof(course) + sum(sys.getsizeof(value) for value in course.values())
+            # 索引中带颜色的课程副本
+            size += sys.getsizeof(course)
+        size += sys.getsizeof(self.course_index)
+        for day_courses in self.course_index.values():
+            size += sys.getsizeof(day_courses)
+        size += sys.getsizeof(self.week_masks) + sys.getsizeof(self.course_positions)
+        return size
+    
+    def _snapshot_sources(self):
+        """快照依赖的源文件"""
+        return [self.courses_file, self.journal.path, self.journal.rotated_path]
+    
+    def _snapshot_key(self):
+        """影响快照内容的其他数据（颜色映射变化时快照失效）"""
+        return (list(self.color_map.items()), list(self.color_resolver.palette))
+    
+    def load_snapshot(self):
+        """从快照恢复课程、索引和已解析的颜色"""
+        payload = load_snapshot(self.snapshot_file, self._snapshot_sources(), self._snapshot_key())
+        if payload is None:
+            return False
+        try:
+            self.courses = payload['courses']
+            self.week_masks = dict(payload['week_masks'])
+            self.color_resolver.restore(payload['colors'])
+            
+            # 每门课程只生成一个带颜色的副本，由它所在的各个 (周, 星期) 共用
+            colored = {}
+            for course in self.courses['courses']:
+                colored[course.get('id')] = dict(course, color=self.color_resolver.resolve(course.get('name', '')))
+            self.course_index = {
+                (week, day): [colored[course_id] for course_id in course_ids]
+                for week, day, course_ids in payload['course_index']
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"课程快照格式错误: {e}")
+            return False
+        logger.info("从快照加载课程数据成功")
+        return True
+    
+    def save_snapshot(self):
+        """为当前课程生成快照（需在课程文件和修改日志都已写入后调用）"""
+        # 其他进程修改过课程时，内存中的数据不是最新的，不能生成快照
+        if self.read_only or not self.journal.in_sync():
+            return False
+        # 快照为 JSON 格式：(周, 星期) 索引只保存课程ID，课程ID -> 周掩码的映射保存为列表
+        payload = {
+            'courses': self.courses,
+            'course_index': [
+                [week, day, [course.get('id') for course in day_courses]]
+                for (week, day), day_courses in self.course_index.items()
+            ],
+            'week_masks': list(self.week_masks.items()),
+            'colors': self.color_resolver.cached(),
+        }
+        return save_snapshot(self.snapshot_file, self._snapshot_sources(), payload, self._snapshot_key())
+    
     def load_courses(self):
         """加载课程数据"""
         try:
-            if os.path.exists(self.courses_file):
-                with open(self.courses_file, 'r', encoding='utf-8') as f:
-                    courses = json.load(f)
-                logger.info("课程数据加载成功")
-                return courses
-            else:
-                logger.info("课程数据文件不存在，创建示例数据")
-                # 创建示例数据
-                example_courses = self.create_example_courses()
-                self.save_courses(example_courses)
-                return example_courses
+            # 在日志文件锁中读取 courses.json 并重放日志，期间合并不会替换课程文件或删除待合并日志段
+            with self.journal.lock:
+                if os.path.exists(self.courses_file):
+                    with open(self.courses_file, 'r', encoding='utf-8') as f:
+                        courses = json.load(f)
+                    
+                    # 重放 courses.json 之后的修改记录，ID计数器取两者中较大的
+                    self.journal.replay(courses.setdefault('courses', []))
+                    courses['next_id'] = max(courses.get('next_id', 1), self.journal.next_id)
+                    
+                    # 上课周只在加载时解析一次
+                    for course in courses.get('courses', []):
+                        self._normalize_weeks(course)
+                    
+                    logger.info("课程数据加载成功")
+                    return courses
+                else:
+                    logger.info("课程数据文件不存在，创建示例数据")
+                    # 创建示例数据
+                    example_courses = self.create_example_courses()
+                    if not self.read_only:
+                        self.journal.clear()
+                        self.save_courses(example_courses)
+                    return example_courses
         except Exception as e:
             logger.error(f"加载课程数据失败: {e}")
             return self.create_example_courses()
     
-    def save_courses(self, courses=None):
-        """保存课程数据"""
+    def save_courses(self, courses=None, callback=None):
+        """保存全部课程数据（单个课程的修改通过 record_change 写入日志）"""
         if courses is None:
             courses = self.courses
         
+        # 上课周以紧凑的范围写法保存，如 "1-16"、"1-15/2"
+        data = courses.copy()
+        data['courses'] = [
+            dict(course, weeks=format_weeks(parse_weeks(course.get('weeks'))))
+            for course in courses.get('courses', [])
+        ]
+        
+        # 由写入服务在后台合并、原子写入，连续编辑只写一次
+        return get_persistence().save(self.courses_file, data, callback=callback)
+    
+    def compact_courses(self):
+        """合并修改日志：在后台由 courses.json 和待合并日志段生成新的 courses.json，写入完成后删除该日志段
+        
+        合并结果只取自文件，不使用内存中的课程，其他进程追加的修改也不会丢失。
+        """
+        if not self.journal.owner or self.journal.compacting:
+            return False
+        # courses.json 可能还有尚未写入的整体保存
+        get_persistence().flush(self.courses_file)
+        if not self.journal.rotate():
+            return False
+        return get_persistence().save(self.courses_file, self._compacted_courses, callback=self.journal.finish_compaction)
+    
+    def _compacted_courses(self):
+        """读取 courses.json 并重放待合并日志段，返回要写入的数据"""
+        if os.path.exists(self.courses_file):
+            with open(self.courses_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        else:
+            data = {'courses': []}
+        next_id = self.journal.replay_rotated(data.setdefault('courses', []))
+        data['next_id'] = max(data.get('next_id', 1), next_id)
+        data['courses'] = [
+            dict(course, weeks=format_weeks(parse_weeks(course.get('weeks'))))
+            for course in data['courses']
+        ]
+        return data
+    
+    def check_writable(self):
+        """只读模式下记录警告并返回 False"""
+        if self.read_only:
+            logger.warning("课表以只读模式打开，不能修改课程")
+            return False
+        return True
+    
+    def record_change(self, course=None, course_id=None):
+        """记录单个课程的修改：course 为新内容，只给出 course_id 表示删除"""
         try:
-            with open(self.courses_file, 'w', encoding='utf-8') as f:
-                json.dump(courses, f, ensure_ascii=False, indent=4)
-            logger.info("课程数据保存成功")
-            return True
+            if course is not None:
+                record = dict(course, weeks=format_weeks(parse_weeks(course.get('weeks'))))
+                self.journal.append('put', course=record, next_id=self.courses.get('next_id'))
+            else:
+                self.journal.append('delete', course_id=course_id, next_id=self.courses.get('next_id'))
         except Exception as e:
-            logger.error(f"保存课程数据失败: {e}")
-            return False
+            # 日志写入失败时退回整体保存
+            logger.error(f"写入课程修改日志失败: {e}")
+            return self.save_courses()
+        
+        if self.journal.needs_compaction():
+            self.compact_courses()
+        return True
+    
+    def _normalize_weeks(self, course):
+        """将课程的上课周统一为升序列表（兼容列表和范围字符串两种格式）"""
+        try:
+            course['weeks'] = weeks_to_list(parse_weeks(course.get('weeks')))
+        except (TypeError, ValueError) as e:
+            logger.error(f"解析课程{course.get('id')}的上课周失败: {e}")
+            course['weeks'] = []
+        return course
     
     def create_example_courses(self):
         """创建示例课程数据"""
@@ -136,12 +414,20 @@ class TimeTable:
             ]
         }
     
+    def get_semester_start_date(self):
+        """获取学期开始日期，只在配置的日期字符串变化时重新解析"""
+        start_date_str = self.config.section('timetable').get('semester_start_date')
+        if start_date_str != self._start_date_str:
+            self._start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date()
+            self._start_date_str = start_date_str
+        return self._start_date
+    
     def get_current_week(self):
         """获取当前教学周"""
+        timetable_config = self.config.section('timetable')
         try:
             # 从配置中获取学期开始日期和当前周数
-            start_date_str = self.config.get('timetable.semester_start_date')
-            start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date()
+            start_date = self.get_semester_start_date()
             
             # 计算当前日期与学期开始日期的差值
             today = datetime.date.today()
@@ -151,7 +437,7 @@ class TimeTable:
             current_week = days_diff // 7 + 1
             
             # 确保周数在合理范围内
-            total_weeks = self.config.get('timetable.total_weeks', 20)
+            total_weeks = timetable_config.get('total_weeks', 20)
             if current_week < 1:
                 current_week = 1
             elif current_week > total_weeks:
@@ -160,34 +446,137 @@ class TimeTable:
             return current_week
         except Exception as e:
             logger.error(f"获取当前教学周失败: {e}")
-            return self.config.get('timetable.current_week', 1)
+            return timetable_config.get('current_week', 1)
+    
+    def get_next_week_start(self):
+        """获取下一个教学周开始的日期，已是最后一周或配置无效时返回 None"""
+        try:
+            start_date = self.get_semester_start_date()
+            
+            current_week = self.get_current_week()
+            if current_week >= self.config.section('timetable').get('total_weeks', 20):
+                return None
+            
+            return start_date + timedelta(days=current_week * 7)
+        except Exception as e:
+            logger.error(f"计算下一教学周失败: {e}")
+            return None
     
     def get_time_slots(self):
         """获取时间段配置"""
-        return self.config.get('timetable.time_slots', [])
+        return self.config.section('timetable').get('time_slots', [])
     
-    def get_weekly_courses(self, week):
-        """获取指定周的课程"""
-        weekly_courses = []
-        
+    def reload_time_slots(self):
+        """根据配置重新编译时间段表"""
+        self._slot_source = self.get_time_slots()
+        self.slot_table = SlotTable(self._slot_source)
+        return self.slot_table
+    
+    def get_slot_table(self):
+        """获取预解析的时间段表"""
+        # 配置中的时间段列表被替换后才重新编译
+        time_slots = self.get_time_slots()
+        if time_slots is not self._slot_source or len(time_slots) != len(self.slot_table):
+            return self.reload_time_slots()
+        return self.slot_table
+    
+    def get_current_slot(self, now=None):
+        """获取当前所在的时间段索引，不在上课时间内时返回 None"""
+        if now is None:
+            now = datetime.datetime.now()
+        return self.get_slot_table().current_slot(now.hour * 60 + now.minute)
+    
+    def build_course_index(self):
+        """重建 (周, 星期) 课程索引"""
+        self.course_index = {}
+        self.week_masks = {}
         for course in self.courses.get('courses', []):
-            # 检查课程是否在指定周进行
-            if week in course.get('weeks', []):
-                # 为课程添加颜色
-                course_with_color = course.copy()
-                course_name = course.get('name', '')
-                
-                # 根据课程名称的第一个字符（通常是学科名）分配颜色
-                for subject, color in self.color_map.items():
-                    if subject in course_name:
-                        course_with_color['color'] = color
-                        break
-                else:
-                    # 如果没有匹配的颜色，使用默认颜色
-                    course_with_color['color'] = '#3f51b5'  # 默认蓝色
-                
-                weekly_courses.append(course_with_color)
+            self._index_course(course, sort=False)
+        for day_courses in self.course_index.values():
+            day_courses.sort(key=lambda x: x.get('slot', 0))
+        logger.info(f"课程索引构建完成: {len(self.course_index)}个(周, 星期)")
+    
+    def _index_course(self, course, sort=True):
+        """将单个课程加入索引（sort 为 False 时由调用者统一排序）"""
+        # 为课程添加颜色
+        course_with_color = course.copy()
+        course_with_color['color'] = self.color_resolver.resolve(course.get('name', ''))
         
+        mask = parse_weeks(course.get('weeks'))
+        self.week_masks[course.get('id')] = mask
+        
+        day = course.get('day')
+        for week in iter_weeks(mask):
+            day_courses = self.course_index.setdefault((week, day), [])
+            day_courses.append(course_with_color)
+            if sort:
+                # 按时间段排序（列表很短，排序开销可忽略）
+                day_courses.sort(key=lambda x: x.get('slot', 0))
+    
+    def _unindex_course(self, course):
+        """从索引中移除单个课程"""
+        course_id = course.get('id')
+        mask = self.week_masks.pop(course_id, 0)
+        
+        day = course.get('day')
+        for week in iter_weeks(mask):
+            key = (week, day)
+            day_courses = self.course_index.get(key)
+            if not day_courses:
+                continue
+            day_courses[:] = [c for c in day_courses if c.get('id') != course_id]
+            if not day_courses:
+                del self.course_index[key]
+    
+    def get_all_courses(self):
+        """获取全部课程"""
+        return list(self.courses.get('courses', []))
+    
+    def get_course(self, course_id):
+        """按ID获取课程，不存在时返回 None"""
+        i = self.course_positions.get(course_id)
+        return self.courses['courses'][i] if i is not None else None
+    
+    def build_id_map(self):
+        """建立课程ID到列表位置的映射，并校正ID计数器"""
+        course_list = self.courses.setdefault('courses', [])
+        self.course_positions = {course.get('id'): i for i, course in enumerate(course_list)}
+        
+        # 下一个可用的课程ID，只增不减，已删除课程的ID不会重复使用
+        max_id = max((course_id for course_id in self.course_positions if isinstance(course_id, int)), default=0)
+        self.courses['next_id'] = max(self.courses.get('next_id', 1), max_id + 1)
+    
+    def allocate_id(self):
+        """分配新的课程ID"""
+        course_id = self.courses.get('next_id', 1)
+        self.courses['next_id'] = course_id + 1
+        return course_id
+    
+    def find_courses(self, teacher=None, location=None):
+        """按教师和/或地点查找课程"""
+        return [
+            course for course in self.courses.get('courses', [])
+            if (teacher is None or course.get('teacher') == teacher)
+            and (location is None or course.get('location') == location)
+        ]
+    
+    def get_week_mask(self, course_id):
+        """获取课程上课周的位掩码"""
+        return self.week_masks.get(course_id, 0)
+    
+    def is_course_in_week(self, course_id, week):
+        """判断课程是否在指定周上课"""
+        return has_week(self.week_masks.get(course_id, 0), week)
+    
+    def get_day_courses(self, week, day):
+        """获取指定周、指定星期的课程（按时间段排序，返回副本，修改课程需调用 update_course）"""
+        return [course.copy() for course in self.course_index.get((week, day), [])]
+    
+    def get_weekly_courses(self, week):
+        """获取指定周的课程（返回副本）"""
+        weekly_courses = []
+        for day in range(7):
+            weekly_courses.extend(course.copy() for course in self.course_index.get((week, day), []))
         return weekly_courses
     
     def get_today_courses(self):
@@ -195,15 +584,7 @@ class TimeTable:
         current_week = self.get_current_week()
         today_weekday = datetime.datetime.now().weekday()  # 0-6 表示周一到周日
         
-        today_courses = []
-        for course in self.get_weekly_courses(current_week):
-            if course.get('day') == today_weekday:
-                today_courses.append(course)
-        
-        # 按时间段排序
-        today_courses.sort(key=lambda x: x.get('slot', 0))
-        
-        return today_courses
+        return self.get_day_courses(current_week, today_weekday)
     
     def get_next_course(self):
         """获取下一节课程"""
@@ -211,87 +592,208 @@ class TimeTable:
         if not today_courses:
             return None
         
-        current_time = datetime.datetime.now().time()
-        time_slots = self.get_time_slots()
+        now = datetime.datetime.now()
+        current_minute = now.hour * 60 + now.minute
+        slot_table = self.get_slot_table()
         
         for course in today_courses:
             slot_index = course.get('slot', 0)
-            if slot_index < len(time_slots):
-                slot = time_slots[slot_index]
-                end_time_str = slot.get('end', '00:00')
-                end_time = datetime.datetime.strptime(end_time_str, '%H:%M').time()
-                
-                if current_time < end_time:
-                    return course
+            if slot_index < len(slot_table) and current_minute < slot_table.end_of(slot_index):
+                return course
         
         return None
     
+    def get_conflict_index(self):
+        """获取课程冲突索引，课程数据有未跟踪的变化（如批量导入）时重建"""
+        if self._conflict_index is None or self._conflict_version != self.version:
+            self._conflict_index = ConflictIndex.build(self.get_all_courses())
+            self._conflict_version = self.version
+        return self._conflict_index
+    
+    def _track_conflicts(self, course=None, course_id=None):
+        """课程修改后增量更新冲突索引：course 为新内容，只给出 course_id 表示删除"""
+        if self._conflict_index is None or self._conflict_version != self.version - 1:
+            return
+        if course is not None:
+            self._conflict_index.add(course)
+        else:
+            self._conflict_index.remove(course_id)
+        self._conflict_version = self.version
+    
+    def check_conflicts(self, course_data, course_id=None):
+        """检查课程（尚未保存）与已有课程的冲突，course_id 为正在编辑的课程，返回冲突的课程列表"""
+        found = self.get_conflict_index().find(course_data, ignore_id=course_id)
+        return [course for course in (self.get_course(other_id) for other_id in sorted(found)) if course is not None]
+    
+    def get_conflicts(self, week=None):
+        """获取所有冲突的课程对 [(课程, 课程)]，week 不为 None 时只返回该周的冲突"""
+        pairs = []
+        for first_id, second_id, _ in self.get_conflict_index().pairs(week):
+            first, second = self.get_course(first_id), self.get_course(second_id)
+            if first is not None and second is not None:
+                pairs.append((first, second))
+        return pairs
+    
     def add_course(self, course_data):
         """添加课程"""
+        if not self.check_writable():
+            return False
         try:
-            # 生成新的课程ID
-            max_id = 0
-            for course in self.courses.get('courses', []):
-                if course.get('id', 0) > max_id:
-                    max_id = course.get('id')
-            
-            new_course = course_data.copy()
-            new_course['id'] = max_id + 1
-            
-            # 添加到课程列表
-            if 'courses' not in self.courses:
-                self.courses['courses'] = []
-            
-            self.courses['courses'].append(new_course)
-            
-            # 保存更新
-            self.save_courses()
-            
-            logger.info(f"添加课程成功: {new_course['name']}")
-            return True
+            # 在日志文件锁中先同步其他进程的修改，再分配ID、写入日志
+            with self.journal.lock:
+                self.sync_storage()
+                new_course = course_data.copy()
+                new_course['id'] = self.allocate_id()
+                self._normalize_weeks(new_course)
+                
+                # 添加到课程列表
+                course_list = self.courses.setdefault('courses', [])
+                self.course_positions[new_course['id']] = len(course_list)
+                course_list.append(new_course)
+                self._index_course(new_course)
+                self.version += 1
+                self._track_conflicts(new_course)
+                
+                # 保存更新
+                self.record_change(new_course)
+                
+                logger.info(f"添加课程成功: {new_course['name']}")
+                return True
         except Exception as e:
             logger.error(f"添加课程失败: {e}")
             return False
     
     def update_course(self, course_id, course_data):
         """更新课程"""
-        try:
-            for i, course in enumerate(self.courses.get('courses', [])):
-                if course.get('id') == course_id:
-                    # 更新课程数据，保留ID
-                    updated_course = course_data.copy()
-                    updated_course['id'] = course_id
-                    
-                    self.courses['courses'][i] = updated_course
-                    
-                    # 保存更新
-                    self.save_courses()
-                    
-                    logger.info(f"更新课程成功: {updated_course['name']}")
-                    return True
-            
-            logger.warning(f"未找到ID为{course_id}的课程")
+        if not self.check_writable():
             return False
+        try:
+            with self.journal.lock:
+                self.sync_storage()
+                i = self.course_positions.get(course_id)
+                if i is None:
+                    logger.warning(f"未找到ID为{course_id}的课程")
+                    return False
+                
+                # 更新课程数据，保留ID
+                course = self.courses['courses'][i]
+                updated_course = course_data.copy()
+                updated_course['id'] = course_id
+                self._normalize_weeks(updated_course)
+                
+                self.courses['courses'][i] = updated_course
+                self._unindex_course(course)
+                self._index_course(updated_course)
+                self.version += 1
+                self._track_conflicts(updated_course)
+                
+                # 保存更新
+                self.record_change(updated_course)
+                
+                logger.info(f"更新课程成功: {updated_course['name']}")
+                return True
         except Exception as e:
             logger.error(f"更新课程失败: {e}")
             return False
     
     def delete_course(self, course_id):
         """删除课程"""
-        try:
-            for i, course in enumerate(self.courses.get('courses', [])):
-                if course.get('id') == course_id:
-                    # 删除课程
-                    del self.courses['courses'][i]
-                    
-                    # 保存更新
-                    self.save_courses()
-                    
-                    logger.info(f"删除课程成功: ID={course_id}")
-                    return True
-            
-            logger.warning(f"未找到ID为{course_id}的课程")
+        if not self.check_writable():
             return False
+        try:
+            with self.journal.lock:
+                self.sync_storage()
+                i = self.course_positions.pop(course_id, None)
+                if i is None:
+                    logger.warning(f"未找到ID为{course_id}的课程")
+                    return False
+                
+                # 删除课程：用最后一门课程填补空位，不移动其余课程
+                course_list = self.courses['courses']
+                course = course_list[i]
+                last = course_list.pop()
+                if last is not course:
+                    course_list[i] = last
+                    self.course_positions[last.get('id')] = i
+                self._unindex_course(course)
+                self.version += 1
+                self._track_conflicts(course_id=course_id)
+                
+                # 保存更新
+                self.record_change(course_id=course_id)
+                
+                logger.info(f"删除课程成功: ID={course_id}")
+                return True
         except Exception as e:
             logger.error(f"删除课程失败: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    def import_courses(self, source, format=None):
+        """批量导入课程（JSON 数组或 CSV），先逐条读取校验，最后一次性写入
+        
+        无效的记录跳过并记录在返回结果的 errors 中，不影响其他记录；
+        读取中途失败时不导入任何记录（与数据库存储一致）。
+        """
+        result = ImportResult()
+        if not self.check_writable():
+            result.add_error(None, "课表以只读模式打开")
+            return result
+        
+        # 读取导入文件时不持有日志文件锁，以免其他进程长时间等待
+        new_courses = []
+        try:
+            for row_no, course, error in read_courses(source, format):
+                if error is not None:
+                    result.add_error(row_no, error)
+                    continue
+                new_courses.append(self._normalize_weeks(course))
+        except Exception as e:
+            logger.error(f"读取导入数据失败: {e}")
+            result.add_error(None, str(e))
+            new_courses = []
+        
+        if new_courses:
+            with self.journal.lock:
+                self.sync_storage()
+                course_list = self.courses.setdefault('courses', [])
+                touched = set()
+                for course in new_courses:
+                    course['id'] = self.allocate_id()
+                    self.course_positions[course['id']] = len(course_list)
+                    course_list.append(course)
+                    self._index_course(course, sort=False)
+                    touched.update((week, course['day']) for week in iter_weeks(self.week_masks[course['id']]))
+                
+                # 只重新排序新增课程所在的 (周, 星期)
+                for key in touched:
+                    self.course_index[key].sort(key=lambda x: x.get('slot', 0))
+                result.imported = len(new_courses)
+                self.version += 1
+                
+                # 新课程一次写入日志，写入者随后整体合并
+                try:
+                    self.journal.append_many([
+                        dict(course, weeks=format_weeks(parse_weeks(course.get('weeks'))))
+                        for course in new_courses
+                    ], next_id=self.courses.get('next_id'))
+                    if self.journal.owner:
+                        self.compact_courses()
+                except Exception as e:
+                    logger.error(f"写入课程修改日志失败: {e}")
+                    self.save_courses()
+        logger.info(f"批量导入课程完成: 成功{result.imported}条，失败{len(result.errors)}条")
+        return result
+
+def create_timetable(config, data_dir=None, read_only=False):
+    """根据配置创建课表管理器（timetable.storage 为 'json' 或 'sqlite'）"""
+    storage = config.get('timetable.storage', 'json')
+    if storage == 'sqlite':
+        from timetable_sqlite import SqliteTimeTable
+        return SqliteTimeTable(config, data_dir, read_only=read_only)
+    return TimeTable(config, data_dir, read_only=read_only)
+
+
+if __name__ == '__main__':
+    # python -m timetable today --json
+    from cli import main
+    sys.exit(main())
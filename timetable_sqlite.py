@@ -0,0 +1,373 @@
+import os
+import sys
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from loguru import logger
+
+from timetable import TimeTable
+from persistence import write_json_atomic
+from course_import import ImportResult, read_courses
+from weeks import parse_weeks, format_weeks, weeks_to_list, iter_weeks, has_week
+
+# 课程表中单独存列的字段，其余字段以 JSON 保存在 extra 列
+COURSE_COLUMNS = ('id', 'name', 'teacher', 'location', 'day', 'slot', 'duration', 'weeks')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS courses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL DEFAULT '',
+    teacher TEXT NOT NULL DEFAULT '',
+    location TEXT NOT NULL DEFAULT '',
+    day INTEGER,
+    slot INTEGER,
+    duration INTEGER NOT NULL DEFAULT 1,
+    weeks TEXT NOT NULL DEFAULT '',
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS course_weeks (
+    week INTEGER NOT NULL,
+    course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
+    PRIMARY KEY (week, course_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_courses_day_slot ON courses(day, slot);
+CREATE INDEX IF NOT EXISTS idx_courses_teacher ON courses(teacher);
+CREATE INDEX IF NOT EXISTS idx_courses_location ON courses(location);
+CREATE INDEX IF NOT EXISTS idx_course_weeks_course ON course_weeks(course_id);
+"""
+
+
+class SqliteTimeTable(TimeTable):
+    """SQLite 存储的课表管理器
+
+    与 TimeTable 接口相同，但课程保存在 data/courses.db 中：
+    查询在数据库中执行，每次修改是一个单行事务，适合上万条课程的大型课表。
+    数据库为空时自动导入 courses.json，也可随时导入、导出 JSON 文件。
+    只读模式下以只读方式打开数据库，数据库不存在时在内存中载入 courses.json。
+    """
+    def __init__(self, config, data_dir=None, db_file=None, read_only=False):
+        self.db_file = db_file
+        self._db_lock = threading.RLock()
+        # 数据库的 data_version，其他连接提交修改后变化
+        self._data_version = None
+        super().__init__(config, data_dir, read_only=read_only)
+
+    def open_storage(self):
+        """打开数据库，首次使用时从 courses.json 导入"""
+        if self.db_file is None:
+            self.db_file = os.path.join(self.data_dir, 'courses.db')
+        if self.read_only:
+            self._open_read_only()
+            return
+        os.makedirs(os.path.dirname(self.db_file), exist_ok=True)
+
+        self.db = sqlite3.connect(self.db_file, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.migrate_schema()
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+
+        count = self.db.execute("SELECT COUNT(*) FROM courses").fetchone()[0]
+        if count == 0:
+            # 首次使用时导入 courses.json（包括尚未合并的修改记录）
+            self._replace_all(self.load_courses().get('courses', []))
+        self.refresh()
+        logger.info(f"课程数据库已打开: {self.db_file}")
+
+    def _open_read_only(self):
+        """以只读方式打开数据库"""
+        if os.path.exists(self.db_file):
+            uri = Path(os.path.abspath(self.db_file)).as_uri() + '?mode=ro'
+            self.db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self.db.row_factory = sqlite3.Row
+        else:
+            # 数据库尚未创建，在内存中载入 courses.json，不写入任何文件
+            self.db = sqlite3.connect(':memory:', check_same_thread=False)
+            self.db.row_factory = sqlite3.Row
+            self.db.executescript(SCHEMA)
+            self._replace_all(self.load_courses().get('courses', []))
+        self.refresh()
+        logger.info(f"课程数据库已以只读方式打开: {self.db_file}")
+    
+    def prepare_refresh(self):
+        """数据库的 data_version 变化（其他连接提交了修改）时返回新的 data_version，否则返回 None"""
+        with self._db_lock:
+            data_version = self.db.execute("PRAGMA data_version").fetchone()[0]
+        return data_version if data_version != self._data_version else None
+    
+    def apply_refresh(self, data_version):
+        """更新课程数据版本（查询总是读取数据库，无需重新加载），返回是否有修改"""
+        changed = self._data_version is not None
+        self._data_version = data_version
+        if changed:
+            self.version += 1
+        return changed
+    
+    def migrate_schema(self):
+        """旧版本的课程表没有 AUTOINCREMENT，删除课程后ID会被重复使用，按新结构重建（需在启用外键前调用）"""
+        row = self.db.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'courses'").fetchone()
+        if row is None or 'AUTOINCREMENT' in row['sql'].upper():
+            return
+        columns = ', '.join(COURSE_COLUMNS + ('extra',))
+        with self.db:
+            self.db.execute(SCHEMA.split(';')[0].replace('EXISTS courses', 'EXISTS courses_new'))
+            self.db.execute(f"INSERT INTO courses_new ({columns}) SELECT {columns} FROM courses")
+            self.db.execute("DROP TABLE courses")
+            self.db.execute("ALTER TABLE courses_new RENAME TO courses")
+        logger.info("课程数据库结构已更新")
+    
+    @property
+    def courses(self):
+        """全部课程（与 JSON 存储的数据格式相同，每次访问都会读取数据库）"""
+        return {'courses': self.get_all_courses()}
+
+    def close(self):
+        """释放课表并关闭数据库连接"""
+        super().close()
+        with self._db_lock:
+            self.db.close()
+
+    def memory_usage(self):
+        """课程保存在数据库中，内存占用只计算颜色缓存"""
+        return sys.getsizeof(self.color_resolver.cached())
+
+    def _row_to_course(self, row):
+        """数据库行转换为课程字典"""
+        course = json.loads(row['extra']) if row['extra'] else {}
+        for column in COURSE_COLUMNS:
+            course[column] = row[column]
+        course['weeks'] = weeks_to_list(parse_weeks(row['weeks']))
+        return course
+
+    def _course_params(self, course):
+        """课程字典转换为数据库参数"""
+        extra = {k: v for k, v in course.items() if k not in COURSE_COLUMNS and k != 'color'}
+        mask = parse_weeks(course.get('weeks'))
+        params = (
+            course.get('id'),
+            course.get('name', ''),
+            course.get('teacher', ''),
+            course.get('location', ''),
+            course.get('day'),
+            course.get('slot'),
+            course.get('duration', 1) or 1,
+            format_weeks(mask),
+            json.dumps(extra, ensure_ascii=False),
+        )
+        return params, mask
+
+    def _write_course(self, course):
+        """写入（插入或替换）单个课程及其上课周，需在事务中调用"""
+        params, mask = self._course_params(course)
+        cursor = self.db.execute(
+            "INSERT OR REPLACE INTO courses (id, name, teacher, location, day, slot, duration, weeks, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            params
+        )
+        course_id = cursor.lastrowid if course.get('id') is None else course['id']
+        self.db.execute("DELETE FROM course_weeks WHERE course_id = ?", (course_id,))
+        self.db.executemany(
+            "INSERT INTO course_weeks (week, course_id) VALUES (?, ?)",
+            ((week, course_id) for week in iter_weeks(mask))
+        )
+        return course_id
+
+    def _replace_all(self, courses):
+        """用给定课程替换数据库中的全部课程（单个事务）"""
+        with self._db_lock, self.db:
+            self.db.execute("DELETE FROM course_weeks")
+            self.db.execute("DELETE FROM courses")
+            for course in courses:
+                self._write_course(self._normalize_weeks(dict(course)))
+        self.version += 1
+
+    def _with_color(self, course):
+        """为课程添加颜色"""
+        course['color'] = self.color_resolver.resolve(course.get('name', ''))
+        return course
+
+    def import_json(self, path=None):
+        """从 JSON 文件导入课程（替换现有课程）"""
+        if not self.check_writable():
+            return False
+        path = path or self.courses_file
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            courses = data.get('courses', [])
+            self._replace_all(courses)
+            logger.info(f"已从{path}导入{len(courses)}门课程")
+            return True
+        except Exception as e:
+            logger.error(f"导入课程数据失败: {e}")
+            return False
+
+    def import_courses(self, source, format=None):
+        """批量导入课程（JSON 数组或 CSV），全部有效记录在一个事务中写入"""
+        result = ImportResult()
+        if not self.check_writable():
+            result.add_error(None, "课表以只读模式打开")
+            return result
+        try:
+            with self._db_lock, self.db:
+                for row_no, course, error in read_courses(source, format):
+                    if error is not None:
+                        result.add_error(row_no, error)
+                        continue
+                    self._write_course(self._normalize_weeks(course))
+                    result.imported += 1
+            self.version += 1
+        except Exception as e:
+            logger.error(f"读取导入数据失败: {e}")
+            result.add_error(None, str(e))
+            result.imported = 0
+        logger.info(f"批量导入课程完成: 成功{result.imported}条，失败{len(result.errors)}条")
+        return result
+
+    def export_json(self, path=None):
+        """导出课程到 JSON 文件（与 courses.json 格式相同）"""
+        path = path or self.courses_file
+        try:
+            data = {'courses': [
+                dict(course, weeks=format_weeks(parse_weeks(course.get('weeks'))))
+                for course in self.get_all_courses()
+            ]}
+            write_json_atomic(path, data)
+            logger.info(f"课程数据已导出到{path}")
+            return True
+        except Exception as e:
+            logger.error(f"导出课程数据失败: {e}")
+            return False
+
+    def save_courses(self, courses=None):
+        """修改已实时写入数据库；传入课程数据时替换全部课程"""
+        if courses is None:
+            return True
+        try:
+            self._replace_all(courses.get('courses', []))
+            return True
+        except Exception as e:
+            logger.error(f"保存课程数据失败: {e}")
+            return False
+
+    def save_snapshot(self):
+        """数据库无需快照"""
+        return True
+
+    def build_course_index(self):
+        """数据库中的索引始终是最新的，无需重建"""
+        pass
+
+    def get_all_courses(self):
+        """获取全部课程"""
+        with self._db_lock:
+            rows = self.db.execute("SELECT * FROM courses ORDER BY id").fetchall()
+        return [self._row_to_course(row) for row in rows]
+
+    def get_course(self, course_id):
+        """按ID获取课程，不存在时返回 None"""
+        with self._db_lock:
+            row = self.db.execute("SELECT * FROM courses WHERE id = ?", (course_id,)).fetchone()
+        return self._row_to_course(row) if row is not None else None
+
+    def find_courses(self, teacher=None, location=None):
+        """按教师和/或地点查找课程（使用索引）"""
+        conditions, params = [], []
+        if teacher is not None:
+            conditions.append("teacher = ?")
+            params.append(teacher)
+        if location is not None:
+            conditions.append("location = ?")
+            params.append(location)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._db_lock:
+            rows = self.db.execute(f"SELECT * FROM courses{where} ORDER BY day, slot", params).fetchall()
+        return [self._row_to_course(row) for row in rows]
+
+    def get_week_mask(self, course_id):
+        """获取课程上课周的位掩码"""
+        with self._db_lock:
+            row = self.db.execute("SELECT weeks FROM courses WHERE id = ?", (course_id,)).fetchone()
+        return parse_weeks(row['weeks']) if row is not None else 0
+
+    def is_course_in_week(self, course_id, week):
+        """判断课程是否在指定周上课"""
+        return has_week(self.get_week_mask(course_id), week)
+
+    def get_day_courses(self, week, day):
+        """获取指定周、指定星期的课程（按时间段排序）"""
+        with self._db_lock:
+            rows = self.db.execute(
+                "SELECT c.* FROM course_weeks w JOIN courses c ON c.id = w.course_id "
+                "WHERE w.week = ? AND c.day = ? ORDER BY c.slot, c.id",
+                (week, day)
+            ).fetchall()
+        return [self._with_color(self._row_to_course(row)) for row in rows]
+
+    def get_weekly_courses(self, week):
+        """获取指定周的课程"""
+        with self._db_lock:
+            rows = self.db.execute(
+                "SELECT c.* FROM course_weeks w JOIN courses c ON c.id = w.course_id "
+                "WHERE w.week = ? ORDER BY c.day, c.slot, c.id",
+                (week,)
+            ).fetchall()
+        return [self._with_color(self._row_to_course(row)) for row in rows]
+
+    def add_course(self, course_data):
+        """添加课程（单行事务）"""
+        if not self.check_writable():
+            return False
+        try:
+            new_course = self._normalize_weeks(course_data.copy())
+            new_course.pop('id', None)
+            with self._db_lock, self.db:
+                new_course['id'] = self._write_course(new_course)
+            self.version += 1
+            self._track_conflicts(new_course)
+            logger.info(f"添加课程成功: {new_course['name']}")
+            return True
+        except Exception as e:
+            logger.error(f"添加课程失败: {e}")
+            return False
+
+    def update_course(self, course_id, course_data):
+        """更新课程（单行事务）"""
+        if not self.check_writable():
+            return False
+        try:
+            updated_course = self._normalize_weeks(course_data.copy())
+            updated_course['id'] = course_id
+            with self._db_lock, self.db:
+                exists = self.db.execute("SELECT 1 FROM courses WHERE id = ?", (course_id,)).fetchone()
+                if exists is None:
+                    logger.warning(f"未找到ID为{course_id}的课程")
+                    return False
+                self._write_course(updated_course)
+            self.version += 1
+            self._track_conflicts(updated_course)
+            logger.info(f"更新课程成功: {updated_course['name']}")
+            return True
+        except Exception as e:
+            logger.error(f"更新课程失败: {e}")
+            return False
+
+    def delete_course(self, course_id):
+        """删除课程（单行事务）"""
+        if not self.check_writable():
+            return False
+        try:
+            with self._db_lock, self.db:
+                cursor = self.db.execute("DELETE FROM courses WHERE id = ?", (course_id,))
+            if cursor.rowcount == 0:
+                logger.warning(f"未找到ID为{course_id}的课程")
+                return False
+            self.version += 1
+            self._track_conflicts(course_id=course_id)
+            logger.info(f"删除课程成功: ID={course_id}")
+            return True
+        except Exception as e:
+            logger.error(f"删除课程失败: {e}")
+            return False
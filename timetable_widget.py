@@ -0,0 +1,208 @@
+from PyQt5.QtCore import Qt, QRectF, QSize, pyqtSignal
+from PyQt5.QtGui import QPainter, QColor, QFont, QFontMetrics, QPen
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+
+WEEKDAYS = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+
+# 课表绘制参数
+CELL_SPACING = 6
+CELL_RADIUS = 5
+CELL_PADDING = 5
+EMPTY_CELL_COLOR = QColor(0, 0, 0, 13)  # rgba(0, 0, 0, 0.05)
+HEADER_TEXT_COLOR = QColor('#212121')
+COURSE_TEXT_COLOR = QColor('white')
+DEFAULT_COURSE_COLOR = '#3f51b5'
+CONFLICT_COLOR = QColor('#d50000')  # 冲突课程的边框颜色
+
+
+class TimetableView(QWidget):
+    """自绘课表视图，在一次 paintEvent 中直接绘制表头、时间、空白单元格和课程块"""
+    course_clicked = pyqtSignal(dict)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+        self.time_slots = []
+        self.courses = []
+        self._key = None
+        self.conflict_ids = set()
+
+        # 字体只创建一次
+        self.header_font = QFont(self.font())
+        self.header_font.setBold(True)
+        self.name_font = QFont(self.font())
+        self.name_font.setBold(True)
+        self.name_font.setPixelSize(12)
+        self.detail_font = QFont(self.font())
+        self.detail_font.setPixelSize(10)
+
+        # 课程块的位置缓存，尺寸或数据变化时重新计算
+        self._blocks = None
+        self._colors = {}
+
+    def set_time_slots(self, time_slots):
+        """设置时间段"""
+        labels = [f"{slot['start']}-{slot['end']}" for slot in time_slots]
+        if labels != self.time_slots:
+            self.time_slots = labels
+            self._invalidate()
+
+    def set_courses(self, courses):
+        """设置课程，内容未变化时不重绘，返回是否有更新"""
+        key = [self._course_key(course) for course in courses]
+        if key == self._key:
+            return False
+        self._key = key
+        self.courses = list(courses)
+        self._invalidate()
+        return True
+
+    def set_conflicts(self, course_ids):
+        """设置存在时间冲突的课程，这些课程块绘制红色边框"""
+        course_ids = set(course_ids)
+        if course_ids != self.conflict_ids:
+            self.conflict_ids = course_ids
+            self.update()
+
+    @staticmethod
+    def _course_key(course):
+        """课程显示内容的快照"""
+        return (
+            course.get('id'),
+            course.get('name', ''),
+            course.get('location', ''),
+            course.get('teacher', ''),
+            course.get('color', DEFAULT_COURSE_COLOR),
+            course.get('day'),
+            course.get('slot'),
+            course.get('duration', 1),
+        )
+
+    def _invalidate(self):
+        """清除布局缓存并请求重绘"""
+        self._blocks = None
+        self.updateGeometry()
+        self.update()
+
+    def sizeHint(self):
+        return QSize(800, 400)
+
+    def minimumSizeHint(self):
+        header_height, time_width = self._header_metrics()
+        return QSize(time_width + len(WEEKDAYS) * 60, header_height + max(len(self.time_slots), 1) * 40)
+
+    def resizeEvent(self, event):
+        self._blocks = None
+        super().resizeEvent(event)
+
+    def _header_metrics(self):
+        """表头行高度和时间列宽度"""
+        metrics = QFontMetrics(self.header_font)
+        header_height = metrics.height() + 2 * CELL_PADDING
+        time_width = metrics.horizontalAdvance("00:00-00:00") + 2 * CELL_PADDING
+        return header_height, time_width
+
+    def _grid_geometry(self):
+        """计算网格的起点和单元格尺寸"""
+        header_height, time_width = self._header_metrics()
+        rows = max(len(self.time_slots), 1)
+        cell_width = (self.width() - time_width) / len(WEEKDAYS)
+        cell_height = (self.height() - header_height) / rows
+        return header_height, time_width, cell_width, cell_height
+
+    def _cell_rect(self, row, col, row_span=1):
+        """第 row 个时间段、第 col 天的单元格矩形（可跨多行）"""
+        header_height, time_width, cell_width, cell_height = self._grid_geometry()
+        return QRectF(
+            time_width + col * cell_width + CELL_SPACING / 2,
+            header_height + row * cell_height + CELL_SPACING / 2,
+            cell_width - CELL_SPACING,
+            row_span * cell_height - CELL_SPACING,
+        )
+
+    def _course_blocks(self):
+        """计算所有课程块的矩形，结果缓存到下次尺寸或数据变化"""
+        if self._blocks is None:
+            blocks = []
+            slot_count = len(self.time_slots)
+            for course in self.courses:
+                slot = course.get('slot', 0)
+                day = course.get('day', 0)
+                if not (0 <= slot < slot_count and 0 <= day < len(WEEKDAYS)):
+                    continue
+                # 持续多个课时的课程跨行显示
+                span = max(1, min(course.get('duration', 1) or 1, slot_count - slot))
+                blocks.append((self._cell_rect(slot, day, span), course))
+            self._blocks = blocks
+        return self._blocks
+
+    def _color(self, name):
+        """缓存 QColor 对象"""
+        color = self._colors.get(name)
+        if color is None:
+            color = QColor(name)
+            self._colors[name] = color
+        return color
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        header_height, time_width, cell_width, cell_height = self._grid_geometry()
+
+        # 表头
+        painter.setFont(self.header_font)
+        painter.setPen(HEADER_TEXT_COLOR)
+        for col, day in enumerate(WEEKDAYS):
+            rect = QRectF(time_width + col * cell_width, 0, cell_width, header_height)
+            painter.drawText(rect, Qt.AlignCenter, day)
+
+        # 时间列
+        for row, label in enumerate(self.time_slots):
+            rect = QRectF(0, header_height + row * cell_height, time_width, cell_height)
+            painter.drawText(rect, Qt.AlignCenter, label)
+
+        # 空白单元格
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(EMPTY_CELL_COLOR)
+        for row in range(len(self.time_slots)):
+            for col in range(len(WEEKDAYS)):
+                painter.drawRoundedRect(self._cell_rect(row, col), CELL_RADIUS, CELL_RADIUS)
+
+        # 课程块
+        conflict_pen = QPen(CONFLICT_COLOR, 2)
+        for rect, course in self._course_blocks():
+            painter.setPen(conflict_pen if course.get('id') in self.conflict_ids else Qt.NoPen)
+            painter.setBrush(self._color(course.get('color', DEFAULT_COURSE_COLOR)))
+            painter.drawRoundedRect(rect, CELL_RADIUS, CELL_RADIUS)
+            self._draw_course_text(painter, rect, course)
+
+        painter.end()
+
+    def _draw_course_text(self, painter, rect, course):
+        """在课程块中绘制课程名称、教室和教师"""
+        text_rect = rect.adjusted(CELL_PADDING, CELL_PADDING, -CELL_PADDING, -CELL_PADDING)
+        detail_height = QFontMetrics(self.detail_font).height()
+        details = [text for text in (course.get('location', ''), course.get('teacher', '')) if text]
+
+        painter.setPen(COURSE_TEXT_COLOR)
+
+        # 课程名称可换行，占据细节文字以外的空间
+        name_rect = text_rect.adjusted(0, 0, 0, -detail_height * len(details))
+        painter.setFont(self.name_font)
+        painter.drawText(name_rect, Qt.AlignCenter | Qt.TextWordWrap, course.get('name', ''))
+
+        painter.setFont(self.detail_font)
+        top = name_rect.bottom()
+        for text in details:
+            painter.drawText(QRectF(text_rect.left(), top, text_rect.width(), detail_height), Qt.AlignCenter, text)
+            top += detail_height
+
+    def mousePressEvent(self, event):
+        """点击课程块时发出信号"""
+        # 后绘制的课程在上层，优先命中
+        for rect, course in reversed(self._course_blocks()):
+            if rect.contains(event.pos()):
+                self.course_clicked.emit(course)
+                break
+        super().mousePressEvent(event)
@@ -1,10 +1,14 @@
 import os
 import json
 import time
+import random
 import datetime
-import requests
+import threading
 from loguru import logger
 
+from http_client import get_client
+from persistence import get_persistence
+
 class WeatherService:
     """天气服务类"""
     def __init__(self, config):
@@ -13,6 +17,19 @@ class WeatherService:
         self.weather_cache_file = os.path.join(self.data_dir, 'weather_cache.json')
         self.last_update_time = 0
         self.weather_data = None
+        # 多日预报，每天一项，按日期升序，日期格式为 YYYY-MM-DD
+        self.forecast = []
+        
+        # 共享的 HTTP 客户端（连接池、条件请求、并发请求合并）
+        self.http = get_client()
+        
+        # 连续失败次数，用于指数退避
+        self.failure_count = 0
+        self.retry_base = 60  # 首次失败后的重试间隔（秒）
+        
+        # 后台刷新线程，同一时间只允许一个
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread = None
         
         # 天气图标映射
         self.weather_icons = {
@@ -44,6 +61,7 @@ class WeatherService:
                 with open(self.weather_cache_file, 'r', encoding='utf-8') as f:
                     cache_data = json.load(f)
                     self.weather_data = cache_data.get('data')
+                    self.forecast = cache_data.get('forecast', [])
                     self.last_update_time = cache_data.get('timestamp', 0)
                 logger.info("天气缓存加载成功")
         except Exception as e:
@@ -54,13 +72,11 @@ class WeatherService:
         try:
             cache_data = {
                 'timestamp': self.last_update_time,
-                'data': self.weather_data
+                'data': self.weather_data,
+                'forecast': self.forecast
             }
             
-            with open(self.weather_cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, ensure_ascii=False, indent=4)
-            
-            logger.info("天气缓存保存成功")
+            get_persistence().save(self.weather_cache_file, cache_data)
         except Exception as e:
             logger.error(f"保存天气缓存失败: {e}")
     
@@ -71,15 +87,86 @@ class WeatherService:
             return None
         
         # 检查是否需要更新天气数据
-        current_time = time.time()
-        update_interval = self.config.get('weather.update_interval', 3600)  # 默认1小时更新一次
-        
-        if self.weather_data is None or (current_time - self.last_update_time) > update_interval:
-            # 需要更新天气数据
+        if self.is_stale():
             self.update_weather()
         
         return self.weather_data
     
+    def get_cached_weather(self):
+        """获取缓存的天气信息，不访问网络
+        
+        缓存是前一天获取的（已过午夜）时，天气状况和风力改用缓存中今天的预报。
+        """
+        if not self.config.get('weather.enable', True):
+            return None
+        if self.weather_data is None:
+            return None
+        
+        today = datetime.date.today().isoformat()
+        if self.weather_data.get('update_time', '')[:10] == today:
+            return self.weather_data
+        day = self.get_day_forecast(today)
+        if day is None:
+            return self.weather_data
+        return dict(
+            self.weather_data,
+            condition=day['condition'],
+            wind_direction=day['wind_direction'],
+            wind_strength=day['wind_strength'],
+            icon=day['icon'],
+        )
+    
+    def is_stale(self):
+        """缓存的天气数据是否需要更新（超过更新间隔，或缓存中已没有今天的预报）"""
+        update_interval = self.config.section('weather').get('update_interval', 3600)
+        if self.weather_data is None or (time.time() - self.last_update_time) > update_interval:
+            return True
+        return bool(self.forecast) and self.forecast_is_stale()
+    
+    def next_refresh_delay(self):
+        """距离下一次刷新的秒数
+        
+        正常情况下在缓存过期时刷新；失败后按指数退避重试，最长不超过更新间隔。
+        加入 ±10% 的随机抖动，避免多台设备同时请求。
+        """
+        update_interval = self.config.get('weather.update_interval', 3600)
+        if self.failure_count:
+            delay = min(self.retry_base * 2 ** (self.failure_count - 1), update_interval)
+        elif self.forecast and self.forecast_is_stale():
+            # 缓存中已没有今天的预报，尽快刷新
+            delay = 0
+        else:
+            delay = update_interval - (time.time() - self.last_update_time)
+        
+        delay = max(delay, 0)
+        delay += delay * random.uniform(-0.1, 0.1)
+        return max(delay, 1)
+    
+    def refresh_async(self, callback=None):
+        """在后台线程中更新天气数据
+        
+        callback(success) 在后台线程中调用，界面需要自行切换回主线程。
+        已有刷新在进行时不会重复发起请求，返回是否启动了新的刷新。
+        """
+        if not self.config.get('weather.enable', True):
+            return False
+        
+        with self._refresh_lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return False
+            
+            def run():
+                success = self.update_weather()
+                if callback is not None:
+                    try:
+                        callback(success)
+                    except Exception as e:
+                        logger.error(f"天气更新回调失败: {e}")
+            
+            self._refresh_thread = threading.Thread(target=run, name='weather-refresh', daemon=True)
+            self._refresh_thread.start()
+            return True
+    
     def update_weather(self):
         """更新天气数据"""
         try:
@@ -89,7 +176,7 @@ class WeatherService:
             # 注意：实际使用时需要替换为您自己的API密钥
             url = f"http://wthrcdn.etouch.cn/weather_mini?citykey={city_code}"
             
-            response = requests.get(url, timeout=10)
+            response = self.http.get(url, timeout=10)
             response.raise_for_status()
             
             weather_json = response.json()
@@ -97,6 +184,9 @@ class WeatherService:
             if weather_json.get('status') == 1000:
                 data = weather_json.get('data', {})
                 
+                # 保存完整的多日预报，之后的查询直接使用缓存
+                self.forecast = self._parse_forecast(data.get('forecast', []))
+                
                 # 提取需要的天气信息
                 self.weather_data = {
                     'city': data.get('city', '未知'),
@@ -111,13 +201,63 @@ class WeatherService:
                 
                 # 更新时间戳和缓存
                 self.last_update_time = time.time()
+                self.failure_count = 0
                 self.save_cache()
                 
                 logger.info(f"天气数据更新成功: {self.weather_data['city']} {self.weather_data['temperature']}°C {self.weather_data['condition']}")
+                return True
             else:
                 logger.error(f"获取天气数据失败: {weather_json.get('desc', '未知错误')}")
         except Exception as e:
             logger.error(f"更新天气数据失败: {e}")
+        
+        self.failure_count += 1
+        return False
+    
+    def _parse_forecast(self, forecast, today=None):
+        """将接口返回的预报列表转换为带日期的缓存格式（第一项为当天）"""
+        if today is None:
+            today = datetime.date.today()
+        
+        days = []
+        for i, day in enumerate(forecast):
+            condition = day.get('type', '未知')
+            days.append({
+                'date': (today + datetime.timedelta(days=i)).isoformat(),
+                'condition': condition,
+                'high': day.get('high', '').replace('高温', '').strip(),
+                'low': day.get('low', '').replace('低温', '').strip(),
+                'wind_direction': day.get('fengxiang', ''),
+                'wind_strength': day.get('fengli', '').replace('<![CDATA[', '').replace(']]>', ''),
+                'icon': self.get_weather_icon(condition)
+            })
+        return days
+    
+    def get_forecast(self, days=None):
+        """从缓存获取从今天开始的多日预报，已过去的日期自动过期"""
+        if not self.config.get('weather.enable', True):
+            return []
+        
+        today = datetime.date.today().isoformat()
+        forecast = [day for day in self.forecast if day['date'] >= today]
+        return forecast[:days] if days is not None else forecast
+    
+    def get_day_forecast(self, date):
+        """从缓存获取指定日期（date 或 YYYY-MM-DD）的预报，没有时返回 None"""
+        if isinstance(date, datetime.date):
+            date = date.isoformat()
+        for day in self.get_forecast():
+            if day['date'] == date:
+                return day
+        return None
+    
+    def get_tomorrow_forecast(self):
+        """从缓存获取明天的预报"""
+        return self.get_day_forecast(datetime.date.today() + datetime.timedelta(days=1))
+    
+    def forecast_is_stale(self, days=1):
+        """缓存中的预报是否不足 days 天（最新一天已过期时需要重新获取）"""
+        return len(self.get_forecast(days)) < days
     
     def get_weather_icon(self, condition):
         """根据天气状况获取图标名称"""
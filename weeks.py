@@ -0,0 +1,133 @@
+# 教学周集合工具
+# 课程的上课周在内存中以位掩码表示（第 n 周对应第 n 位），成员判断、
+# 单双周筛选、并集与交集都是整数位运算；课程文件中使用紧凑的范围写法，
+# 例如 "1-16"、"1-15/2"、"1-8,10-16"。
+
+# 支持的最大周数（设置中的总周数不超过 30，留有余量）
+MAX_WEEK = 64
+
+
+def parse_weeks(value):
+    """将周数据解析为位掩码
+
+    支持整数列表（旧格式）、范围字符串以及单个周数（整数）。
+    周数须在 1 到 MAX_WEEK 之间，格式错误或超出范围时抛出 ValueError。
+    """
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        raise ValueError(f"无效的周数据: {value!r}")
+    if isinstance(value, int):
+        _check_week(value)
+        return 1 << value
+    if isinstance(value, str):
+        return _parse_range_string(value)
+
+    mask = 0
+    for week in value:
+        week = int(week)
+        _check_week(week)
+        mask |= 1 << week
+    return mask
+
+
+def _check_week(week):
+    """检查周数是否在 1 到 MAX_WEEK 之间"""
+    if not 1 <= week <= MAX_WEEK:
+        raise ValueError(f"无效的周数: {week}")
+
+
+def _parse_range_string(text):
+    """解析 "1-16"、"1-15/2"、"3,5,7" 这样的范围字符串"""
+    mask = 0
+    for part in text.replace('，', ',').split(','):
+        part = part.strip()
+        if not part:
+            continue
+
+        step = 1
+        if '/' in part:
+            part, step_str = part.split('/', 1)
+            step = int(step_str)
+
+        if '-' in part:
+            start_str, end_str = part.split('-', 1)
+            start, end = int(start_str), int(end_str)
+        else:
+            start = end = int(part)
+
+        if start < 1 or end < start or end > MAX_WEEK or step < 1:
+            raise ValueError(f"无效的周范围: {part}")
+
+        mask |= week_range(start, end, step)
+    return mask
+
+
+def format_weeks(mask):
+    """将位掩码格式化为紧凑的范围字符串"""
+    parts = []
+    while mask:
+        first = (mask & -mask).bit_length() - 1
+
+        # 分别计算连续周和单双周（间隔为2）的最长序列
+        run1 = _run_length(mask, first, 1)
+        run2 = _run_length(mask, first, 2)
+
+        if run2 >= 3 and run2 > run1:
+            last = first + 2 * (run2 - 1)
+            parts.append(f"{first}-{last}/2")
+            mask &= ~week_range(first, last, 2)
+        elif run1 >= 2:
+            last = first + run1 - 1
+            parts.append(f"{first}-{last}")
+            mask &= ~week_range(first, last)
+        else:
+            parts.append(str(first))
+            mask &= ~(1 << first)
+    return ','.join(parts)
+
+
+def _run_length(mask, start, step):
+    """从 start 周开始，以 step 为间隔连续出现在掩码中的周数"""
+    length = 0
+    week = start
+    while (mask >> week) & 1:
+        length += 1
+        week += step
+    return length
+
+
+def weeks_to_list(mask):
+    """位掩码转为升序的周数列表"""
+    return list(iter_weeks(mask))
+
+
+def iter_weeks(mask):
+    """按升序遍历位掩码中的周数"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def has_week(mask, week):
+    """判断指定周是否在集合中"""
+    return week >= 1 and (mask >> week) & 1 == 1
+
+
+def week_range(start, end, step=1):
+    """生成 start 到 end（含）的周掩码"""
+    mask = 0
+    for week in range(start, end + 1, step):
+        mask |= 1 << week
+    return mask
+
+
+def odd_weeks(total_weeks):
+    """1 到 total_weeks 中的单周"""
+    return week_range(1, total_weeks, 2)
+
+
+def even_weeks(total_weeks):
+    """1 到 total_weeks 中的双周"""
+    return week_range(2, total_weeks, 2)